@@ -0,0 +1,249 @@
+"""Benchmark CONCAT(...) = CONCAT(...) joins against the composite-key joins in query_db.
+
+Loads seeded synthetic RET / topology tables into a throw-away schema on a local
+PostgreSQL, creates the indexes from migrations/002_composite_join_indexes.sql,
+then times the legacy CONCAT queries against the current fetch_data_* functions
+and checks that both return identical result sets, NULL join keys included.
+
+    python -m benchmarks.bench_composite_joins --dsn postgresql://postgres@localhost/postgres
+"""
+import argparse
+import io
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from scripts.query_db import (
+    fetch_data_hw, fetch_data_hw_no_map, fetch_data_bfant_tilt, fetch_data_nr_tilt, fetch_data_split_tilt,
+)
+
+SCHEMA = "cr_bench"
+MIGRATION = Path(__file__).resolve().parents[1] / "migrations" / "002_composite_join_indexes.sql"
+START_DATE, DAYS = pd.Timestamp("2024-07-01"), 14
+# Every NULL_SITE_STEP-th site has NULL sub-identifiers (see synthetic_tables)
+NULL_SITE_STEP = 50
+
+# The join conditions as they were before the composite-key rewrite
+LEGACY_SQL = {
+    "hw": """
+    WITH LatestData AS (
+        SELECT DISTINCT ON (name, device_name, device_no, subunit_no)
+            site_name, name, device_name, device_no, subunit_no, date, Actual_tilt
+        FROM hwret_data
+        WHERE {where_clause_2}
+        ORDER BY name, device_name, device_no, subunit_no, date DESC
+    )
+    SELECT site_name, a.name, a.device_name, a.device_no, a.subunit_no, c.max_tilt, c.min_tilt, a.date, Actual_tilt
+    FROM LatestData a
+    LEFT JOIN retdevicedata_1 c
+        ON concat(a.date,a.NAME,a.Device_Name,a.Device_No,a.subunit_no) = concat(c.date,c.NAME,c.Device_Name,c.Device_No,c.subunit_no)
+    """,
+    "hw_no_map": """
+    SELECT 'huawei' AS antenna_type, site_name, a.NAME, a.Device_Name, a.Device_No, a.subunit_no,
+           c.max_tilt, c.min_tilt, a.date, Actual_tilt
+    FROM hwret_data a
+    LEFT JOIN retdevicedata_1 c
+        ON concat(a.NAME, a.Device_Name, a.Device_No, a.subunit_no) = concat(c.NAME, c.Device_Name, c.Device_No, c.subunit_no)
+    WHERE a.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause_2}
+    GROUP BY antenna_type, site_name, a.NAME, a.Device_Name, a.Device_No, a.subunit_no, a.date, c.max_tilt, c.min_tilt, Actual_tilt
+    """,
+    "bfant_tilt": """
+    SELECT a.cell_name, a.system, a.local_cell_id, b.name AS bfant_name, b.device_no, b.connect_rru_subrack_no,
+           c.local_cell_id AS local_cell_id_cellphy, b.date, b.tilt
+    FROM {sql_lte} a
+    LEFT JOIN cellphytopo c ON CONCAT(a.enodeb_name, a.local_cell_id) = CONCAT(c.name, c.local_cell_id)
+    LEFT JOIN bfant b ON CONCAT(b.name, b.connect_rru_subrack_no) = CONCAT(c.name, split_part(c.rf_module_information, '-', 2))
+    WHERE b.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause}
+    GROUP BY a.cell_name,a.system, a.local_cell_id, b.name,b.device_no, b.connect_rru_subrack_no, c.local_cell_id,b.date, b.tilt
+    """,
+    "nr_tilt": """
+    SELECT a.nr_cell_name, a.system, a.nr_du_cell_id, b.name AS NRDUCELLTRPBEAM_name, b.nr_du_cell_trp_id, b.date, b.tilt
+    FROM {sql_nr} a
+    JOIN NRDUCELLTRPBEAM b ON CONCAT(a.gnodeb_name, a.nr_du_cell_id) = CONCAT(b.name, b.nr_du_cell_trp_id)
+    WHERE b.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause}
+    GROUP BY a.nr_cell_name,a.system, a.nr_du_cell_id, b.name,b.nr_du_cell_trp_id,b.date, b.tilt
+    """,
+    "split_tilt": """
+    SELECT a.cell_name, a.system, a.local_cell_id, b.name AS SPLITCELL_name, b.local_cell_id as SPLITCELL_local_cell_id,
+           b.date, cell_beam_tilt
+    FROM {sql_lte} a
+    JOIN SECTORSPLITCELL b ON CONCAT(a.enodeb_name, a.local_cell_id) = CONCAT(b.name, b.local_cell_id)
+    WHERE b.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause}
+    GROUP BY a.cell_name,a.system, a.local_cell_id, b.name,b.local_cell_id,b.date, cell_beam_tilt
+    """,
+}
+
+TABLES = {
+    "hwret_data": "site_name text, name text, device_name text, device_no int, subunit_no int, date date, actual_tilt int",
+    "retdevicedata_1": "name text, device_name text, device_no int, subunit_no int, date date, max_tilt int, min_tilt int",
+    "lte_bench": "site text, site_id text, enodeb_name text, cell_name text, system text, sector_name text, "
+                 "local_cell_id int",
+    "nr_bench": "site text, gnodeb_name text, nr_cell_name text, nr_du_cell_id int, system text",
+    "cellphytopo": "name text, local_cell_id int, rf_module_information text",
+    "bfant": "name text, device_no int, connect_rru_subrack_no int, date date, tilt int",
+    "nrducelltrpbeam": "name text, nr_du_cell_trp_id int, date date, tilt int",
+    "sectorsplitcell": "name text, local_cell_id int, date date, cell_beam_tilt int",
+}
+
+
+def _null_where(frame, column, mask):
+    """Set ``column`` to NULL where ``mask`` holds; integer columns stay integers in the CSV."""
+    values = frame[column].astype("Int64") if pd.api.types.is_integer_dtype(frame[column]) else frame[column]
+    frame[column] = values.mask(np.asarray(mask))
+
+
+def synthetic_tables(n_sites: int, seed: int) -> dict:
+    """Return {table: DataFrame} for a national-scale network of ``n_sites`` sites.
+
+    Every NULL_SITE_STEP-th site has NULL sub-identifiers (subunit_no, local_cell_id,
+    connect_rru_subrack_no, nr_du_cell_id) on one device or cell, on both sides
+    of each join, to check that NULL keys match as they did under CONCAT.
+    """
+    rng = np.random.default_rng(seed)
+    sites = np.array([f"BKK{i:04d}" for i in range(n_sites)])
+    null_sites = sites[::NULL_SITE_STEP]
+    dates = pd.date_range(START_DATE, periods=DAYS).date
+    bands = np.array(["HB", "LB", "2300"])
+
+    # Huawei RET devices: 3 bands x 3 sectors, 2 subunits each, one row per day
+    dev = pd.MultiIndex.from_product(
+        [sites, range(9), (1, 2), dates], names=["site_name", "device_no", "subunit_no", "date"]
+    ).to_frame(index=False)
+    dev["name"] = dev["site_name"] + "_ENB"
+    dev["device_name"] = bands[dev["device_no"] % 3] + "_SET1_S" + (dev["device_no"] // 3 + 1).astype(str)
+    dev["actual_tilt"] = rng.integers(0, 100, len(dev))
+    ret = dev[["name", "device_name", "device_no", "subunit_no", "date"]].copy()
+    ret["max_tilt"], ret["min_tilt"] = 100, 0
+    for frame, name in ((dev, "name"), (ret, "name")):
+        _null_where(frame, "subunit_no", frame[name].str[:7].isin(null_sites) & (frame["subunit_no"] == 2))
+
+    cells = pd.MultiIndex.from_product([sites, range(9)], names=["site", "local_cell_id"]).to_frame(index=False)
+    cells["site_id"] = cells["site"]
+    cells["enodeb_name"] = cells["site"] + "_ENB"
+    cells["cell_name"] = cells["site"] + "_L18_S" + (cells["local_cell_id"] + 1).astype(str)
+    cells["system"] = "L1800"
+    cells["sector_name"] = "S" + (cells["local_cell_id"] % 3 + 1).astype(str)
+    topo = pd.DataFrame({
+        "name": cells["enodeb_name"],
+        "local_cell_id": cells["local_cell_id"],
+        "rf_module_information": "0-" + (60 + cells["local_cell_id"] % 3).astype(str) + "-0",
+    })
+    null_cell = cells["site"].isin(null_sites) & (cells["local_cell_id"] == 8)
+    _null_where(topo, "rf_module_information", null_cell)
+
+    per_day = lambda frame: frame.merge(pd.DataFrame({"date": dates}), how="cross")
+    bfant = per_day(pd.DataFrame({
+        "name": np.repeat(sites + "_ENB", 3), "device_no": np.tile(range(3), n_sites),
+        "connect_rru_subrack_no": np.tile(range(60, 63), n_sites),
+    }))
+    bfant["tilt"] = rng.integers(0, 100, len(bfant))
+    _null_where(bfant, "connect_rru_subrack_no", bfant["name"].str[:7].isin(null_sites) & (bfant["device_no"] == 2))
+    for frame in (cells, topo):
+        _null_where(frame, "local_cell_id", null_cell)
+    split = per_day(cells[["enodeb_name", "local_cell_id"]].rename(columns={"enodeb_name": "name"}))
+    split["cell_beam_tilt"] = rng.integers(0, 100, len(split))
+
+    nr = pd.DataFrame({
+        "site": np.repeat(sites, 3), "gnodeb_name": np.repeat(sites + "_GNB", 3),
+        "nr_du_cell_id": np.tile(range(3), n_sites), "system": "NR2600",
+    })
+    nr["nr_cell_name"] = nr["site"] + "_NR_S" + (nr["nr_du_cell_id"] + 1).astype(str)
+    _null_where(nr, "nr_du_cell_id", nr["site"].isin(null_sites) & (nr["nr_du_cell_id"] == 2))
+    beam = per_day(nr[["gnodeb_name", "nr_du_cell_id"]].rename(
+        columns={"gnodeb_name": "name", "nr_du_cell_id": "nr_du_cell_trp_id"}))
+    beam["tilt"] = rng.integers(0, 100, len(beam))
+
+    return {
+        "hwret_data": dev, "retdevicedata_1": ret, "lte_bench": cells, "nr_bench": nr,
+        "cellphytopo": topo, "bfant": bfant, "nrducelltrpbeam": beam, "sectorsplitcell": split,
+    }
+
+
+def load(conn, tables: dict):
+    """(Re)create the bench schema, COPY the synthetic frames in and build the indexes."""
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA}; SET search_path TO {SCHEMA}")
+        for name, frame in tables.items():
+            columns = [c.split()[0] for c in TABLES[name].split(", ")]
+            cur.execute(f"CREATE TABLE {name} ({TABLES[name]})")
+            buf = io.StringIO()
+            frame[columns].to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cur.copy_expert(f"COPY {name} ({', '.join(columns)}) FROM STDIN WITH CSV", buf)
+        cur.execute(MIGRATION.read_text())
+        cur.execute("ANALYZE")
+    conn.commit()
+
+
+def timed(run, repeat: int):
+    """Return (result, median seconds) of ``run`` over ``repeat`` runs."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        durations.append(time.perf_counter() - start)
+    return result, statistics.median(durations)
+
+
+def canonical(df: pd.DataFrame) -> pd.DataFrame:
+    """Row order is not part of a query's contract; compare sorted results."""
+    df = df.copy()
+    df.columns = [c.lower() for c in df.columns]
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True, help="libpq URI of a scratch PostgreSQL database")
+    parser.add_argument("--sites", type=int, default=2000, help="sites in the synthetic national network")
+    parser.add_argument("--cluster-sites", type=int, default=100, help="sites in the benchmarked cluster")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn)
+    tables = synthetic_tables(args.sites, args.seed)
+    load(conn, tables)
+
+    sites = tables["lte_bench"]["site"].drop_duplicates()
+    cluster = sites.sample(args.cluster_sites, random_state=args.seed)
+    # Always cover some sites with NULL keys
+    cluster = pd.concat([sites.iloc[::NULL_SITE_STEP].head(5), cluster]).drop_duplicates()
+    site_list = "', '".join(cluster)
+    where_clause, where_clause_2 = f"site IN ('{site_list}')", f"site_name IN ('{site_list}')"
+    cluster = list(cluster)
+    start_date = START_DATE.strftime("%Y-%m-%d")
+    end_date = (START_DATE + pd.Timedelta(days=DAYS - 1)).strftime("%Y-%m-%d")
+    params = dict(where_clause=where_clause, where_clause_2=where_clause_2, sql_lte="lte_bench",
+                  sql_nr="nr_bench", start_date=start_date, end_date=end_date)
+    cases = {
+        "hw": (fetch_data_hw, (cluster,)),
+        "hw_no_map": (fetch_data_hw_no_map, (cluster, start_date, end_date)),
+        "bfant_tilt": (fetch_data_bfant_tilt, ("lte_bench", cluster, start_date, end_date)),
+        "nr_tilt": (fetch_data_nr_tilt, ("nr_bench", cluster, start_date, end_date)),
+        "split_tilt": (fetch_data_split_tilt, ("lte_bench", cluster, start_date, end_date)),
+    }
+
+    print(f"{'query':<12} {'rows':>8} {'concat s':>10} {'composite s':>12} {'speedup':>8}  identical")
+    all_identical = True
+    for name, (func, fetch_args) in cases.items():
+        legacy, legacy_s = timed(lambda: pd.read_sql_query(LEGACY_SQL[name].format(**params), conn), args.repeat)
+        current, current_s = timed(lambda: func(*fetch_args, conn), args.repeat)
+        identical = canonical(legacy).equals(canonical(current))
+        all_identical &= identical
+        print(f"{name:<12} {len(current):>8} {legacy_s:>10.3f} {current_s:>12.3f} {legacy_s / current_s:>7.1f}x  {identical}")
+
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    conn.commit()
+    conn.close()
+    if not all_identical:
+        raise SystemExit("Result sets differ between CONCAT and composite-key joins")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Microbenchmarks for the ret_utils parsers on seeded synthetic inputs.
+
+Each case builds the frame its function receives inside scripts.main (already
+pivoted to one column per date), with the name variants seen in production:
+dash and underscore LTE cell names, 2-digit and '<band>-S<sector>C<carrier>'
+sectorcarrierids, Huawei device_name variants and multi-band userlabels.
+Every case is timed at 1k, 100k and 1M rows; throughput and peak traced memory
+are written to a JSON baseline, and later runs are flagged against it.
+
+    python -m benchmarks.bench_ret_utils --save        # record the baseline
+    python -m benchmarks.bench_ret_utils               # compare against it
+    python -m benchmarks.bench_ret_utils --sizes 1000 100000 --only hwret suggestion
+"""
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ret_utils.io_helper import load_cell_list, suggestion
+from ret_utils.ret_finding import lte_cell_normalized, eric_air, hwret, eric_non_air
+
+BASELINE = Path(__file__).resolve().with_name("baseline_ret_utils.json")
+SIZES = (1_000, 100_000, 1_000_000)
+DATES = pd.date_range("2024-07-01", periods=3).date
+LTE_SYSTEMS = np.array(["L700", "L900", "L1800", "L2100", "L2300", "L2600"])
+
+
+def _sites(rng, rows, per_site):
+    return np.array([f"BKK{i:04d}" for i in range(max(rows // per_site, 1))])[rng.integers(0, max(rows // per_site, 1), rows)]
+
+
+def _with_dates(df, rng):
+    for day in DATES:
+        df[day] = rng.integers(0, 100, len(df)).astype("float64")
+    return df
+
+
+def _pick(rng, rows, variants, weights):
+    """Row-wise choice between variant arrays of length ``rows``."""
+    choice = rng.choice(len(variants), rows, p=np.asarray(weights) / sum(weights))
+    return np.select([choice == i for i in range(len(variants))], variants, default=None).astype(object)
+
+
+def make_lte(rows, rng):
+    """lte_<WEEK> rows: 14-char 'SITE-BAND-<carrier><A-C>' and 'SITE_BAND_<S|M><n>' cell names."""
+    site = _sites(rng, rows, 12)
+    system = LTE_SYSTEMS[rng.integers(0, len(LTE_SYSTEMS), rows)]
+    sector = rng.integers(1, 4, rows)
+    carrier = rng.integers(1, 4, rows).astype(str)
+    band = pd.Series(system).str[1:3].to_numpy(dtype=object)
+    cell_name = _pick(rng, rows, [
+        site + "-" + band + "-" + carrier + np.array(list("ABC"))[sector - 1],
+        site + "_" + system + "_S" + sector.astype(str),
+        site + "_" + band + "_M" + (sector + 10).astype(str) + "_EXT",
+        site + "-" + band + "-ü" + np.array(list("ABC"))[sector - 1],  # non-ASCII
+    ], [60, 30, 8, 2])
+    return pd.DataFrame({
+        "site": site, "site_id": site, "cell_name": cell_name, "system": system,
+        "sector_name": "S" + sector.astype(str).astype(object),
+        "antenna_type": np.array(["AAU5614", "ATR4518R6", "AIR6449", "AAU5711a"])[rng.integers(0, 4, rows)],
+        "vendor": np.array(["Huawei", "Ericsson"])[rng.integers(0, 2, rows)],
+        "mtilt": rng.integers(0, 10, rows), "height": rng.integers(20, 60, rows),
+        "xtxr": np.array(["4T4R", "8T8R", "64T64R"])[rng.integers(0, 3, rows)],
+        "local_cell_id": rng.integers(0, 12, rows), "rat": "LTE",
+    })
+
+
+def make_eric_air(rows, rng):
+    """Pivoted eric_air_data: '<sector><carrier>', 'L23-S03C2' style and malformed sectorcarrierids."""
+    site = _sites(rng, rows, 9)
+    nodeid = site + np.array(["_L23", "_L21", "_L18"])[rng.integers(0, 3, rows)]
+    sector, carrier = rng.integers(1, 4, rows).astype(str), rng.integers(1, 3, rows).astype(str)
+    sectorcarrierid = _pick(rng, rows, [
+        sector + carrier,
+        np.array(["L23", "L18", "L07", "L33"])[rng.integers(0, 4, rows)] + "-S0" + sector + "C" + carrier,
+        np.array(["S1C1", "1", "L21-S1", "X-SAC1"])[rng.integers(0, 4, rows)],
+    ], [55, 40, 5])
+    return _with_dates(pd.DataFrame({"site": site, "nodeid": nodeid, "sectorcarrierid": sectorcarrierid}), rng)
+
+
+def make_hwret(rows, rng):
+    """Pivoted hwret_data: conventional, multi-band, lettered-sector and unparsable device names."""
+    site = _sites(rng, rows, 18)
+    sector = rng.integers(1, 4, rows).astype(str)
+    device_name = _pick(rng, rows, [
+        np.array(["HB", "LB", "2300", "2600"])[rng.integers(0, 4, rows)] + "_SET1_S" + sector,
+        "LB900_1800_S" + sector + "_S" + (rng.integers(4, 7, rows)).astype(str),
+        "RET_2300_S" + np.array(list("ABC"))[rng.integers(0, 3, rows)],
+        np.array(["AAU5614_HB", "ANT1800", "Unknown"])[rng.integers(0, 3, rows)],
+        np.full(rows, None, dtype=object),
+    ], [60, 20, 10, 8, 2])
+    return _with_dates(pd.DataFrame({
+        "site_name": site, "name": site + "_ENB", "device_name": device_name,
+        "device_no": rng.integers(0, 9, rows), "subunit_no": rng.integers(1, 3, rows),
+        "max_tilt": 100, "min_tilt": 0,
+    }), rng)
+
+
+def make_eric_non_air(rows, rng):
+    """Pivoted eric_non_air_data: single and multi-band userlabels, numeric and text group ids."""
+    site = _sites(rng, rows, 9)
+    sector = rng.integers(1, 4, rows).astype(str)
+    userlabel = _pick(rng, rows, [
+        np.array(["L18", "L21", "L23", "G09", "U21"])[rng.integers(0, 5, rows)] + "_S" + sector,
+        "L18_S" + sector + "+L21_S" + sector + "_By_Triplexer",
+        "U09/L07_S" + sector,
+        "L07_S" + np.array(list("ABC"))[rng.integers(0, 3, rows)],
+        np.array(["ANT", "", "L9_X"])[rng.integers(0, 3, rows)],
+        np.full(rows, None, dtype=object),
+    ], [55, 20, 10, 8, 5, 2])
+    return _with_dates(pd.DataFrame({
+        "site": site, "nodeid": site + "_L09", "userlabel": userlabel,
+        "antennaunitgroupid": _pick(rng, rows, [sector, sector + ".0", np.full(rows, "RET", dtype=object)], [80, 15, 5]),
+        "antennanearunitid": rng.integers(1, 3, rows).astype(str).astype(object),
+        "retsubunitid": rng.integers(1, 3, rows).astype(str).astype(object),
+        "antennamodelnumber": "ATR4518", "mintilt": 0, "maxtilt": 100,
+    }), rng)
+
+
+def make_cell_list(rows, rng):
+    """A tuning-list CSV with padded names in both formats and a few names without a site."""
+    lte = make_lte(rows, rng)
+    names = _pick(rng, rows, [lte["cell_name"].to_numpy(), np.full(rows, "NOSITE_CELL", dtype=object)], [98, 2])
+    path = Path(tempfile.mkdtemp(prefix="bench_ret_utils_")) / "Tuning_cell_list.csv"
+    pd.DataFrame({"Cell Name": " " + names + " ", "Remark": "tune"}).to_csv(path, index=False)
+    return path
+
+
+def make_suggestion(rows, rng):
+    """Matched cells as they reach the suggestion column (LTE and NR mixed)."""
+    return pd.DataFrame({
+        "xtxr": np.array(["4T4R", "8T8R", "64T64R", "64t64r"])[rng.integers(0, 4, rows)],
+        "vendor": np.array(["Huawei", "Ericsson", "Nokia"])[rng.integers(0, 3, rows)],
+        "antenna_type": np.array(["AAU5614", "AAU5711a", "ATR4518R6", "AIR6449", "AAU5636_X"])[rng.integers(0, 5, rows)],
+        "is_lte": rng.integers(0, 2, rows).astype(bool),
+    })
+
+
+def run_suggestion(df):
+    return suggestion(df['xtxr'], df['vendor'], df['antenna_type'], is_lte=df['is_lte'].to_numpy())
+
+
+# name: (build input, run on a fresh copy of it)
+CASES = {
+    "lte_cell_normalized": (make_lte, lte_cell_normalized),
+    "eric_air": (make_eric_air, lambda df: eric_air(df, sectorcarrierid_col='sectorcarrierid', nodeid_col='nodeid')),
+    "hwret": (make_hwret, hwret),
+    "eric_non_air": (make_eric_non_air, eric_non_air),
+    "load_cell_list": (make_cell_list, load_cell_list),
+    "suggestion": (make_suggestion, run_suggestion),
+}
+
+
+def measure(func, data, repeat: int):
+    """Return (median seconds, peak traced MB); inputs are copied outside the timed region."""
+    fresh = (lambda: data.copy()) if isinstance(data, pd.DataFrame) else (lambda: data)
+    durations = []
+    for _ in range(repeat):
+        arg = fresh()
+        start = time.perf_counter()
+        func(arg)
+        durations.append(time.perf_counter() - start)
+    # Traced separately: tracemalloc slows allocation-heavy code down too much to time under it
+    arg = fresh()
+    tracemalloc.start()
+    try:
+        func(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return statistics.median(durations), peak / 2**20
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Return a message per case/size whose throughput or peak memory regressed past ``tolerance``."""
+    regressions = []
+    for name, sizes in results.items():
+        for size, now in sizes.items():
+            before = baseline.get(name, {}).get(size)
+            if before is None:
+                continue
+            if now["rows_per_s"] < before["rows_per_s"] * (1 - tolerance):
+                regressions.append(f"{name} @ {size}: throughput {now['rows_per_s']:,.0f} rows/s "
+                                   f"vs baseline {before['rows_per_s']:,.0f}")
+            if now["peak_mb"] > before["peak_mb"] * (1 + tolerance) and now["peak_mb"] - before["peak_mb"] > 1:
+                regressions.append(f"{name} @ {size}: peak {now['peak_mb']:.1f} MB vs baseline {before['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="row counts per case")
+    parser.add_argument("--only", nargs="+", choices=CASES, help="run only these cases")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown / memory growth")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or CASES:
+        build, func = CASES[name]
+        for rows in args.sizes:
+            data = build(rows, np.random.default_rng(args.seed))
+            seconds, peak_mb = measure(func, data, args.repeat)
+            if isinstance(data, Path):
+                shutil.rmtree(data.parent)
+            results.setdefault(name, {})[str(rows)] = {
+                "seconds": round(seconds, 5), "rows_per_s": round(rows / seconds), "peak_mb": round(peak_mb, 2),
+            }
+            print(f"{name:20s} {rows:>9,d} rows  {seconds:9.4f}s  {rows / seconds:>13,.0f} rows/s  {peak_mb:9.1f} MB peak")
+
+    if args.save:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        for name, sizes in results.items():
+            baseline.setdefault("results", {}).setdefault(name, {}).update(sizes)
+        baseline["meta"] = {
+            "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "machine": platform.machine(), "seed": args.seed, "repeat": args.repeat,
+        }
+        args.baseline.write_text(json.dumps(baseline, indent=1) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    if regressions:
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
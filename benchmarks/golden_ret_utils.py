@@ -0,0 +1,130 @@
+"""Golden-output check for the ret_utils parsers.
+
+benchmarks/golden/ holds, per case, a pickled input frame and the frame the
+parser returned for it before the vectorised rewrites (the loop and per-row
+regex implementations). Running the check feeds every input to the current
+code and compares the result exactly: values, dtypes, column order and index.
+The inputs are the seeded synthetic frames of bench_ret_utils plus hand-written
+edge cases (missing, numeric and non-ASCII names).
+
+    python -m benchmarks.golden_ret_utils              # exits 1 on a difference
+    python -m benchmarks.golden_ret_utils --update     # rewrite the expected outputs
+
+Only use ``--update`` after an intended change of output.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_ret_utils import make_lte, make_eric_air, make_hwret, make_eric_non_air
+from ret_utils.ret_finding import lte_cell_normalized, eric_air, hwret, eric_non_air
+
+GOLDEN_DIR = Path(__file__).resolve().with_name("golden")
+ROWS = 3000
+SEED = 2024
+
+
+def lte_edges():
+    names = ['ABC1234-AB-1A', 'ÄBCD123-ABC-1É', 'ABC1234-AB-1ä', 'X_S' + '9' * 15, 'x_É1', 'é_S3',
+             'ABC1234-A-B-1A', 'ABCD1234567_1A', 'BKK0001_L1800_M12_EXT', 'BKK0001_L18', 'foo', '', 'AB-CD']
+    return pd.DataFrame({'cell_name': pd.Series(names, dtype=object),
+                         'system': pd.Series(['L700', 'L900', None, 'L2600'] * 3 + ['L1800'], dtype=object)})
+
+
+def eric_air_edges():
+    ids = ['11', '32', 'L23-S03C2', 'L18-S1C1', 'S1C1', '1', 'L21-S1', 'X-SAC1', '', None, '9', 'L07-S10C3']
+    df = pd.DataFrame({'site': ['BKK0001'] * 6 + ['BKK0002'] * 6, 'nodeid': ['BKK0001_L23'] * 6 + ['BKK0002_L18'] * 6,
+                       'sectorcarrierid': pd.Series(ids, dtype=object)})
+    df['2024-07-01'] = np.arange(len(df), dtype='float64')
+    return df
+
+
+def hwret_edges():
+    names = ['HB_SET1_S1', 'LB900_1800_S1_S4', 'RET_2300_SA', 'AAU5614_HB', 'ANT1800', 'Unknown', None,
+             '2600_SET2_S3', 'LB_S2', 'M900_1800_2100_S1', '', 'L1800_S1_S2_S3']
+    df = pd.DataFrame({'site_name': ['BKK0001'] * 6 + ['BKK0002'] * 6, 'name': 'BKK_ENB',
+                       'device_name': pd.Series(names, dtype=object), 'device_no': range(12),
+                       'subunit_no': [1, 2] * 6, 'max_tilt': 100, 'min_tilt': 0})
+    df['2024-07-01'] = np.arange(len(df), dtype='float64')
+    return df
+
+
+def eric_non_air_edges():
+    labels = ['L18_S1', None, np.nan, 7, 'L21_SA+L23_S2', '', 'L18_S1+L21_S1_By_Triplexer', 'U09/L07_S2', 1.5, 'L9_X']
+    groups = ['1', '1.0', 2.0, 'abc', None, np.nan, '3', 4, None, 'RET']
+    df = pd.DataFrame({'site': ['S1'] * 5 + ['S2'] * 5, 'nodeid': 'N', 'userlabel': pd.Series(labels, dtype=object),
+                       'antennaunitgroupid': pd.Series(groups, dtype=object), 'antennanearunitid': '1',
+                       'retsubunitid': [1, 2] * 5, 'antennamodelnumber': 'M', 'mintilt': 0, 'maxtilt': 100})
+    df['2024-07-05'] = np.arange(len(df))
+    return df
+
+
+def _seeded(make):
+    return lambda: make(ROWS, np.random.default_rng(SEED))
+
+
+def run_eric_air(df):
+    return eric_air(df, sectorcarrierid_col='sectorcarrierid', nodeid_col='nodeid')
+
+
+# name: (build input, run on a copy of it)
+CASES = {
+    "lte_cell_normalized": (_seeded(make_lte), lte_cell_normalized),
+    "lte_cell_normalized_edges": (lte_edges, lte_cell_normalized),
+    "eric_air": (_seeded(make_eric_air), run_eric_air),
+    "eric_air_edges": (eric_air_edges, run_eric_air),
+    "hwret": (_seeded(make_hwret), hwret),
+    "hwret_edges": (hwret_edges, hwret),
+    "eric_non_air": (_seeded(make_eric_non_air), eric_non_air),
+    "eric_non_air_edges": (eric_non_air_edges, eric_non_air),
+}
+
+
+def _path(name):
+    return GOLDEN_DIR / f"{name}.pkl.gz"
+
+
+def check(names) -> list:
+    """Return the names of the cases whose output differs from the golden one."""
+    failed = []
+    for name in names:
+        golden = pd.read_pickle(_path(name))
+        got = CASES[name][1](golden["input"].copy())
+        try:
+            pd.testing.assert_frame_equal(got, golden["expected"], check_exact=True)
+        except AssertionError as exc:
+            print(f"{name}: DIFFERENT\n{exc}")
+            failed.append(name)
+        else:
+            print(f"{name}: same ({len(got)} rows)")
+    return failed
+
+
+def update(names):
+    """Store the current output of every case; inputs are built only for new cases."""
+    GOLDEN_DIR.mkdir(exist_ok=True)
+    for name in names:
+        build, run = CASES[name]
+        data = pd.read_pickle(_path(name))["input"] if _path(name).exists() else build()
+        pd.to_pickle({"input": data, "expected": run(data.copy())}, _path(name))
+        print(f"{name}: written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), help="cases to run (default: all)")
+    parser.add_argument("--update", action="store_true", help="rewrite the expected outputs from the current code")
+    args = parser.parse_args()
+    names = args.only or list(CASES)
+    if args.update:
+        update(names)
+        return
+    if check(names):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
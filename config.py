@@ -49,9 +49,12 @@ def build_cfg(args) -> dict:
         start = datetime.strptime(args.start, "%Y-%m-%d")
         end = datetime.strptime(args.end, "%Y-%m-%d")
 
+    # --cluster takes several names; CLUSTER_NAME may hold a comma-separated list
+    clusters = args.cluster or [c.strip() for c in os.getenv("CLUSTER_NAME", "").split(",") if c.strip()]
     cfg = {
         "WEEK_NUM": week,
-        "CLUSTER_NAME": args.cluster or os.getenv("CLUSTER_NAME"),
+        "CLUSTER_NAME": clusters[0] if clusters else None,
+        "CLUSTER_NAMES": clusters,
         "START_DATE": start.strftime("%Y-%m-%d"),
         "END_DATE": end.strftime("%Y-%m-%d")
     }
@@ -1,6 +1,28 @@
-"""PostgreSQL helpers for connection and simple queries."""
+"""PostgreSQL helpers for connection and simple queries.
+
+This is the one connection layer of the project: every query checks a DB-API
+connection out of the pooled engine with ``connection()`` and reads through
+``read_sql`` or ``iter_batches``.
+
+read_sql returns the whole result as a DataFrame from a plain cursor: libpq
+receives every row before pandas builds the frame, so a result must fit in
+memory (about twice over, rows plus frame). With DB_PREPARE=1 it runs each
+distinct SQL text as a prepared statement instead, planned once per pooled
+session and re-executed with new parameters.
+
+iter_batches reads a server-side (named) cursor DB_FETCH_ROWS rows at a time
+and yields each chunk as an Arrow batch, so only one chunk is held on the
+client. It is the path for results too large to hold whole.
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+import hashlib
+import re
+import uuid
+
 from sqlalchemy import create_engine
 import pandas as pd
+import pyarrow as pa
 import os
 
 # Re‑use .env settings that config.py already loads
@@ -9,41 +31,185 @@ DB_URL = (
     f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
 )
 
+# Upper bound on simultaneous DB connections (and concurrent fetch_data_* queries)
+DB_MAX_CONCURRENCY = int(os.getenv("DB_MAX_CONCURRENCY", "4"))
+# Rows per FETCH from iter_batches' server-side cursor (the size of the chunks it yields)
+DB_FETCH_ROWS = int(os.getenv("DB_FETCH_ROWS", "50000"))
+# DB_PREPARE=1: read_sql runs PREPAREd statements (plans reused across a run) instead of plain queries
+DB_PREPARE = os.getenv("DB_PREPARE", "0") == "1"
+
 _engine = None
 
 def get_engine():
     global _engine
     if _engine is None:
-        _engine = create_engine(DB_URL, pool_pre_ping=True)
+        _engine = create_engine(
+            DB_URL,
+            pool_pre_ping=True,
+            pool_size=DB_MAX_CONCURRENCY,
+            max_overflow=0,
+        )
     return _engine
 
 
+@contextmanager
+def connection():
+    """Check a DB-API connection out of the pool; it is rolled back and returned on exit."""
+    conn = get_engine().raw_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _server_cursor(conn):
+    """A named (server-side) cursor, or a plain one for drivers without them."""
+    try:
+        cursor = conn.cursor(name=f"cr_{uuid.uuid4().hex[:16]}")
+    except TypeError:
+        return conn.cursor()
+    setup = conn.cursor()
+    try:
+        # The whole result is always read, so plan for all rows rather than the first 10%
+        setup.execute("SET LOCAL cursor_tuple_fraction = 1.0")
+    finally:
+        setup.close()
+    return cursor
+
+
+class _ChunkedCursor:
+    """DB-API cursor over a server-side cursor whose fetchmany() pulls ``chunk_rows`` at a time.
+
+    A named cursor has no ``description`` until rows are fetched, so ``execute``
+    fetches the first chunk straight away.
+    """
+
+    def __init__(self, cursor, chunk_rows):
+        self._cursor, self._chunk_rows, self._head = cursor, chunk_rows, []
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(sql, params)
+        self._head = self._cursor.fetchmany(self._chunk_rows)
+
+    def fetchmany(self, size=None):
+        if self._head:
+            rows, self._head = self._head, []
+            return rows
+        return self._cursor.fetchmany(size or self._chunk_rows)
+
+    def close(self):
+        self._cursor.close()
+
+
+_PARAM = re.compile(r"%\((\w+)\)s")
+
+
+class _PreparedCursor:
+    """DB-API cursor that runs pyformat (``%(name)s``) queries as prepared statements.
+
+    The statement is named after a hash of the SQL text and PREPAREd the first
+    time a session sees it (``pg_prepared_statements`` is checked, so pooled
+    connections keep their statements for the rest of the run). Prepared
+    statements cannot back a server-side cursor, so the result is buffered whole.
+    """
+
+    def __init__(self, conn):
+        self._cursor = conn.cursor()
+
+    def execute(self, sql, params=None):
+        names = list(dict.fromkeys(_PARAM.findall(sql)))
+        statement = "cr_" + hashlib.sha1(sql.encode()).hexdigest()[:16]
+        self._cursor.execute("SELECT 1 FROM pg_prepared_statements WHERE name = %s", (statement,))
+        if not self._cursor.fetchone():
+            body = _PARAM.sub(lambda m: f"${names.index(m.group(1)) + 1}", sql).replace("%%", "%")
+            self._cursor.execute(f"PREPARE {statement} AS {body}")
+        args = ", ".join(f"%({name})s" for name in names)
+        self._cursor.execute(f"EXECUTE {statement}({args})" if names else f"EXECUTE {statement}", params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _PreparedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _PreparedCursor(self._conn)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def read_sql(sql: str, conn, params=None, prepare: bool = None) -> pd.DataFrame:
+    """``pandas.read_sql_query`` on ``conn``; the whole result is held in memory.
+
+    With ``prepare`` (default DB_PREPARE) the query runs as a prepared statement
+    instead; see ``_PreparedCursor``. Use ``iter_batches`` for results that
+    should not be held whole.
+    """
+    if DB_PREPARE if prepare is None else prepare:
+        return pd.read_sql_query(sql, _PreparedConnection(conn), params=params)
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+# PostgreSQL type OID -> Arrow type of iter_batches columns. Integers are widened to
+# int64 and numeric read as float64, as read_sql gives them; other OIDs become strings.
+_ARROW_TYPES = {
+    16: pa.bool_(), 20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+    700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+    19: pa.string(), 25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+    1082: pa.date32(), 1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC'),
+}
+
+
+def _arrow_column(values, type_):
+    if type_ == pa.float64():
+        values = [float(v) if isinstance(v, Decimal) else v for v in values]
+    elif type_ == pa.string():
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    return pa.array(values, type=type_)
+
+
+def iter_batches(sql: str, conn, chunk_rows: int = None, params=None):
+    """Yield the result of ``sql`` as ``pyarrow.RecordBatch`` chunks of up to ``chunk_rows`` rows.
+
+    Only one chunk is held on the client at a time; consumers write or reduce
+    each batch (``batch.to_pandas()`` for a DataFrame) before the next is fetched.
+    Every batch has the same schema, derived from the column types, and at least
+    one (possibly empty) batch is yielded.
+    """
+    chunk_rows = chunk_rows or DB_FETCH_ROWS
+    cursor = _ChunkedCursor(_server_cursor(conn), chunk_rows)
+    try:
+        cursor.execute(sql, params)
+        schema = pa.schema([(col[0], _ARROW_TYPES.get(col[1], pa.string())) for col in cursor.description])
+        first = True
+        while (rows := cursor.fetchmany()) or first:
+            columns = list(zip(*rows)) if rows else [()] * len(schema)
+            yield pa.RecordBatch.from_arrays(
+                [_arrow_column(values, field.type) for values, field in zip(columns, schema)], schema=schema)
+            first = False
+    finally:
+        cursor.close()
+
+
 def list_tables(schema: str = "public") -> pd.DataFrame:
     """Return DataFrame of table names in the given schema."""
     q = (
         "SELECT table_name\n"
         "FROM information_schema.tables\n"
-        "WHERE table_schema = :schema AND table_type = 'BASE TABLE'\n"
+        "WHERE table_schema = %(schema)s AND table_type = 'BASE TABLE'\n"
         "ORDER BY 1;"
     )
-    return pd.read_sql(q, get_engine(), params={"schema": schema})
+    return run_query(q, schema=schema)
 
 
 def run_query(sql: str, **params) -> pd.DataFrame:
-    """Run parameterised SQL and return a DataFrame.
-
-
-    ``pandas.read_sql`` passes an ``immutabledict`` instance when no parameters
-    are supplied, which some DB drivers treat as an invalid sequence.  To avoid
-    the resulting ``TypeError`` we open a raw DBAPI connection and pass ``None``
-    instead of an empty mapping when no parameters are provided.
-    """
-    conn = get_engine().raw_connection()
-    try:
-        if params:
-            return pd.read_sql(sql, conn, params=params)
-        return pd.read_sql(sql, conn)
-    finally:
-        conn.close()
-
-    
+    """Run parameterised SQL on a pooled connection and return a DataFrame (see ``read_sql``)."""
+    with connection() as conn:
+        return read_sql(sql, conn, params=params or None)
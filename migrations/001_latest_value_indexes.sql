@@ -0,0 +1,15 @@
+-- Indexes for the "latest value per device" queries (fetch_data_air / _non_air / _hw).
+-- The site filters are LEFT(nodeid, 7) = ANY(...) and site_name = ANY(...) over the bound
+-- text[] of sites, so the Ericsson tables get an expression index on the 7-char site prefix.
+-- For AIR and Huawei the trailing columns are the DISTINCT ON keys followed by date DESC, so
+-- a site's rows can be read in DISTINCT ON order. The non-AIR index only continues with nodeid:
+-- its DISTINCT ON key is eight columns wide, so the cluster's rows are sorted after the scan.
+
+CREATE INDEX IF NOT EXISTS eric_air_data_site_latest_idx
+    ON eric_air_data (left(nodeid, 7), nodeid, sectorcarrierid, date DESC);
+
+CREATE INDEX IF NOT EXISTS eric_non_air_data_site_latest_idx
+    ON eric_non_air_data (left(nodeid, 7), nodeid, date DESC);
+
+CREATE INDEX IF NOT EXISTS hwret_data_site_latest_idx
+    ON hwret_data (site_name, name, device_name, device_no, subunit_no, date DESC);
@@ -0,0 +1,20 @@
+-- Composite indexes for the multi-column joins in fetch_data_hw, fetch_data_hw_no_map,
+-- fetch_data_bfant_tilt, fetch_data_nr_tilt and fetch_data_split_tilt. The weekly
+-- lte_<WEEK> / nr_<WEEK> tables are the driving side of those joins and are filtered
+-- by site, so they need no join index of their own.
+
+CREATE INDEX IF NOT EXISTS retdevicedata_1_device_idx
+    ON retdevicedata_1 (name, device_name, device_no, subunit_no, date);
+
+CREATE INDEX IF NOT EXISTS cellphytopo_cell_idx
+    ON cellphytopo (name, local_cell_id);
+
+-- bfant is matched on the text RRU subrack taken from cellphytopo.rf_module_information
+CREATE INDEX IF NOT EXISTS bfant_subrack_idx
+    ON bfant (name, (connect_rru_subrack_no::text), date);
+
+CREATE INDEX IF NOT EXISTS nrducelltrpbeam_cell_idx
+    ON nrducelltrpbeam (name, nr_du_cell_trp_id, date);
+
+CREATE INDEX IF NOT EXISTS sectorsplitcell_cell_idx
+    ON sectorsplitcell (name, local_cell_id, date);
@@ -0,0 +1,81 @@
+"""Tuning-band catalogue: every system name / band token -> tuning band rule in one place.
+
+Each naming scheme has its own table, because the sources disagree on what
+they may contain: the LTE cell table only maps LTE systems, a 2-digit AIR
+sectorcarrierid takes its band from the nodeid suffix, and so on. The regexes
+that find band tokens in Huawei device names and Ericsson userlabels are built
+from the same tables at import, so a new band is one table entry.
+
+``map_band`` maps a whole Series in one lookup over its distinct values.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+# lte_<WEEK> / nr_<WEEK> system -> tuning band
+LTE_SYSTEM_BANDS = {
+    'L700': 'LB', 'L900': 'LB',
+    'L1800': 'MB', 'L2100': 'MB',
+    'L2300': 'L2300',
+    'L2600': '2600',
+}
+NR_SYSTEM_BANDS = {'NR700': 'LB', 'NR2600': '2600'}
+SYSTEM_BANDS = {**LTE_SYSTEM_BANDS, **NR_SYSTEM_BANDS}
+
+# Ericsson AIR: band prefix of a 'L23-S03C2' sectorcarrierid, and the nodeid suffix used for 2-digit ids
+AIR_PREFIX_BANDS = {
+    'L23': 'L2300', 'L33': 'L2300',
+    'L18': 'MB', 'L21': 'MB',
+    'L07': 'LB', 'L09': 'LB',
+}
+AIR_NODE_BANDS = {'L23': 'L2300', 'L21': 'MB'}
+
+# Ericsson non-AIR: digits after 'L' in a userlabel part ('L18_S1'); alternatives are tried in this order
+NONAIR_LABEL_BANDS = {
+    '07': 'LB', '7': 'LB',
+    '09': 'LB', '9': 'LB',
+    '18': 'MB',
+    '21': 'MB',
+    '23': 'L2300',
+}
+
+# Huawei: band tokens in a RET device_name, and the order a device's bands are listed in
+HUAWEI_TOKEN_BANDS = {
+    '850': '850',
+    '700': 'LB', '900': 'LB', 'LB': 'LB',
+    '1800': 'MB', '2100': 'MB', 'HB': 'MB',
+    '2300': 'L2300',
+    '2600': 'L2600',
+}
+HUAWEI_BAND_RANK = {'850': 0, 'LB': 1, 'MB': 2, 'L2300': 3, 'L2600': 4}
+
+
+def alternation(table) -> str:
+    """Regex alternation of the table's keys, in table order."""
+    return "|".join(map(re.escape, table))
+
+
+# The lookbehinds skip numbers glued to a 3-4 letter word; no token overlaps another,
+# so one findall pass sees every token
+HUAWEI_BAND_TOKEN = re.compile(rf'(?<!\b[a-zA-Z]{{3}})(?<!\b[a-zA-Z]{{4}})({alternation(HUAWEI_TOKEN_BANDS)})')
+NONAIR_LABEL_BAND = rf'(?<![A-Z]{{2}})L({alternation(NONAIR_LABEL_BANDS)})'
+
+
+def map_band(values: pd.Series, table: dict, default=None, keep_unmapped: bool = False) -> pd.Series:
+    """``table[value]`` per row as an object Series; values not in the table (or missing)
+    give ``default``, or stay as they are with ``keep_unmapped``."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    bands = pd.Series(uniques, dtype=object).map(table).to_numpy(dtype=object)[codes]
+    fallback = values.to_numpy(dtype=object) if keep_unmapped else default
+    return pd.Series(np.where(pd.isna(bands), fallback, bands), index=values.index, dtype=object)
+
+
+def system_band(systems: pd.Series) -> pd.Series:
+    """Tuning band of LTE and NR system names, 'Unknown' for anything else (tuning-list matching)."""
+    return map_band(systems, SYSTEM_BANDS, default='Unknown')
+
+
+def lte_cell_band(systems: pd.Series) -> pd.Series:
+    """Tuning band of the LTE cell table's systems; systems it does not map are kept as they are."""
+    return map_band(systems, LTE_SYSTEM_BANDS, keep_unmapped=True)
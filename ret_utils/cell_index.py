@@ -0,0 +1,215 @@
+"""Keyed index over the normalized LTE cells for the RET map joins.
+
+``CellIndex`` is built once per cluster from ``lte_cell_normalized`` output. It
+encodes each key column (site, tuning_band, sector, carrier) as integer codes
+and drops duplicate cells, comparing whole rows only among cells that share a
+composite key. Each vendor frame is probed on any subset of those keys, and
+only its matching rows are deduplicated, the same way.
+
+``index.join(vendor, on)`` gives the same rows, in the same order, as
+``pd.merge(cells, vendor, on=on, how='inner').drop_duplicates()``. Joining two
+duplicate-free frames cannot produce duplicate rows, so nothing is compared
+after the join. As with merge, missing keys match each other.
+"""
+import numpy as np
+import pandas as pd
+
+KEYS = ('site', 'tuning_band', 'sector', 'carrier')
+
+
+def _repeated_rows(df: pd.DataFrame, positions: np.ndarray, key: np.ndarray) -> np.ndarray:
+    """Mask over ``positions`` of the rows ``drop_duplicates()`` would drop (all but the first of equal rows).
+
+    Equal rows have equal join keys, so only rows sharing a ``key`` code are
+    compared in full; rows with a unique key are never hashed.
+    """
+    repeated = np.zeros(len(positions), dtype=bool)
+    shared = np.flatnonzero(pd.Series(key).duplicated(keep=False).to_numpy())
+    if len(shared):
+        repeated[shared[df.iloc[positions[shared]].duplicated().to_numpy()]] = True
+    return repeated
+
+
+def _is_numeric(dtype) -> bool:
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+
+def _canonical(series: pd.Series, as_object: bool):
+    """``(values, missing)`` in a form where equal keys compare equal: float64 with NaN, or object with None."""
+    if not as_object and _is_numeric(series.dtype):
+        values = series.to_numpy(dtype='float64', na_value=np.nan)
+        return values, np.isnan(values)
+    values = series.to_numpy(dtype=object)
+    missing = pd.isna(values)
+    values[missing] = None
+    return values, missing
+
+
+def _categories_compatible(left: pd.Series, right: pd.Series) -> bool:
+    """Both categorical, one category list a prefix of the other (a shared append-only vocabulary)."""
+    if not (isinstance(left.dtype, pd.CategoricalDtype) and isinstance(right.dtype, pd.CategoricalDtype)):
+        return False
+    a, b = left.cat.categories, right.cat.categories
+    n = min(len(a), len(b))
+    return left.cat.ordered == right.cat.ordered and a[:n].equals(b[:n])
+
+
+class _KeyColumn:
+    """Integer codes of one key column of the cells; -1 never occurs, missing values get their own code."""
+
+    def __init__(self, series: pd.Series):
+        self.series = series
+        self.dtype = series.dtype
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy().astype('int64')
+            self.na_code = len(series.cat.categories)
+            self.codes = np.where(codes < 0, self.na_code, codes)
+            self.size = self.na_code + 1
+        else:
+            self._encode(_canonical(series, as_object=False))
+        self._object = None
+
+    def _encode(self, canonical):
+        values, _ = canonical
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        self.uniques = uniques
+        self.na_code = len(uniques)
+        self.codes = np.where(codes < 0, self.na_code, codes).astype('int64')
+        self.size = self.na_code + 1
+
+    def subset(self, mask) -> '_KeyColumn':
+        """This column restricted to the rows in ``mask``; codes keep their meaning."""
+        column = _KeyColumn.__new__(_KeyColumn)
+        column.__dict__.update(self.__dict__, series=self.series[mask], codes=self.codes[mask], _object=None)
+        return column
+
+    def probe(self, other: pd.Series) -> np.ndarray:
+        """Codes of ``other``'s values in this column; -1 where the value does not occur among the cells."""
+        if _categories_compatible(self.series, other):
+            codes = other.cat.codes.to_numpy().astype('int64')
+            missing = codes < 0
+            codes[codes >= self.na_code] = -1  # categories added to the vocabulary after the cells
+            codes[missing] = self.na_code
+            return codes
+        if isinstance(self.dtype, pd.CategoricalDtype) or _is_numeric(self.dtype) != _is_numeric(other.dtype):
+            # Mixed kinds compare as Python objects, as merge does; encoded once per cell column
+            if self._object is None:
+                column = _KeyColumn.__new__(_KeyColumn)
+                column._encode(_canonical(self.series, as_object=True))
+                self._object = column
+            column = self._object
+            values, missing = _canonical(other, as_object=True)
+        else:
+            column = self
+            values, missing = _canonical(other, as_object=False)
+        # A fresh Index per probe: the map stages probe concurrently and Index's lazy hash table is not thread-safe
+        codes = pd.Index(column.uniques).get_indexer(values)
+        codes[missing] = column.na_code
+        return codes if column is self else self._translate(column, codes)
+
+    def _translate(self, column, codes):
+        # Object-encoded codes and this column's codes differ; map through the cells' own rows
+        lookup = np.full(column.size, -1, dtype='int64')
+        lookup[column.codes] = self.codes
+        return np.where(codes < 0, -1, lookup[codes])
+
+
+def _combine(columns_codes, sizes):
+    """Collapse per-column codes into dense composite codes ``0..n-1``; returns ``(codes, n)``."""
+    key = np.zeros(len(columns_codes[0]), dtype='int64')
+    bound = 1
+    for codes, size in zip(columns_codes, sizes):
+        if bound * size >= 2**62:  # refactorize before the radix overflows
+            key, uniques = pd.factorize(key)
+            bound = len(uniques)
+        key = key * size + codes
+        bound *= size
+    key, uniques = pd.factorize(key)
+    return key, len(uniques)
+
+
+def tuple_codes(left: pd.DataFrame, right: pd.DataFrame):
+    """Integer codes for the rows of two frames with the same key columns, equal exactly where the key tuples are.
+
+    A tuple with any part missing gets -1 on both sides, so incomplete keys
+    only match each other, as a concatenated string key that came out NaN did.
+    """
+    n = len(left)
+    codes, sizes = [], []
+    missing = np.zeros(n + len(right), dtype=bool)
+    for col in left.columns:
+        column_codes, uniques = pd.factorize(pd.concat([left[col], right[col]], ignore_index=True))
+        missing |= column_codes < 0
+        codes.append(np.maximum(column_codes, 0))
+        sizes.append(max(len(uniques), 1))
+    key, _ = _combine(codes, sizes)
+    key[missing] = -1
+    return key[:n], key[n:]
+
+
+class CellIndex:
+    """The normalized LTE cells of one cluster, deduplicated and encoded on ``keys`` for repeated joins."""
+
+    def __init__(self, cells: pd.DataFrame, keys=KEYS):
+        self.keys = tuple(keys)
+        columns = [_KeyColumn(cells[key]) for key in self.keys]
+        key, _ = _combine([column.codes for column in columns], [column.size for column in columns])
+        keep = ~_repeated_rows(cells, np.arange(len(cells)), key)
+        if not keep.all():
+            cells = cells[keep]
+            columns = [column.subset(keep) for column in columns]
+        self.cells = cells
+        self._columns = dict(zip(self.keys, columns))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def join(self, other: pd.DataFrame, on) -> pd.DataFrame:
+        """Inner join of the cells with ``other`` on ``on`` (a subset of the index keys), without duplicate rows."""
+        on = list(on)
+        missing = [key for key in on if key not in self._columns]
+        if missing:
+            raise KeyError(f"CellIndex has no key column {missing}; built on {list(self.keys)}")
+        columns = [self._columns[key] for key in on]
+        probes = [column.probe(other[key]) for key, column in zip(on, columns)]
+        # Only rows whose keys all occur among the cells can match, so only those are deduplicated
+        rows = np.flatnonzero(np.logical_and.reduce([codes >= 0 for codes in probes]))
+        # Cells and probes are combined together so both sides get the same composite codes
+        n = len(self.cells)
+        keys, size = _combine([np.concatenate([column.codes, codes[rows]]) for column, codes in zip(columns, probes)],
+                        [column.size for column in columns])
+        keep = ~_repeated_rows(other, rows, keys[n:])
+        cell_pos, other_pos = _match(keys[:n], keys[n:][keep], rows[keep], size)
+        return self._assemble(other, on, cell_pos, other_pos)
+
+    def _assemble(self, other, on, cell_pos, other_pos):
+        left = self.cells.take(cell_pos).reset_index(drop=True)
+        for key in on:
+            left_dtype, right_dtype = left[key].dtype, other[key].dtype
+            # merge falls back to object keys against object columns or differing categories
+            categorical = isinstance(left_dtype, pd.CategoricalDtype) and isinstance(right_dtype, pd.CategoricalDtype)
+            if left_dtype != right_dtype and (categorical or object in (left_dtype, right_dtype)):
+                left[key] = left[key].astype(object)
+        rest = [col for col in other.columns if col not in on]
+        right = other[rest].take(other_pos).reset_index(drop=True)
+        overlap = set(left.columns).intersection(rest)
+        left = left.rename(columns={col: f"{col}_x" for col in overlap})
+        right = right.rename(columns={col: f"{col}_y" for col in overlap})
+        return pd.concat([left, right], axis=1)
+
+
+def _match(keys, probe_keys, probe_rows, size):
+    """(cell, probe) row pairs with equal keys, ordered by cell row and then probe row (merge's order).
+
+    Keys are dense codes below ``size``, so the probe rows are bucketed by a
+    stable sort and each cell looks up its bucket directly.
+    """
+    order = np.argsort(probe_keys, kind='stable')
+    per_key = np.bincount(probe_keys, minlength=size)
+    counts = per_key[keys]
+    lo = (np.cumsum(per_key) - per_key)[keys]
+    total = int(counts.sum())
+    cell_pos = np.repeat(np.arange(len(keys)), counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    other_pos = probe_rows[order[np.repeat(lo, counts) + offsets]]
+    return cell_pos, other_pos
@@ -0,0 +1,148 @@
+"""Opt-in compact column types for the pipeline frames (MEMORY_MODE=columnar).
+
+At rest, string columns are pyarrow-backed, and the low-cardinality ones
+(vendor, system, tuning_band, site, MO, ...) are categoricals. All frames in a
+run draw those categories from one shared ``Vocabulary``. Because every frame
+uses the same dtype, the map merges join on category codes instead of Python
+strings. The ret_finding parsers and the cell-matching string arithmetic
+still get plain object columns; ``restore`` converts back at those stage
+boundaries.
+
+This only shrinks what is held between stages. The fetches still build object
+frames before ``compact`` runs, and each ``restore`` is an object copy held
+next to the compact frame while its stage runs.
+"""
+import logging
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+LOW_CARDINALITY = {
+    'vendor', 'system', 'tuning_band', 'antenna_type', 'rat', 'site', 'site_name', 'file_type',
+    'MO', 'Parameter', 'Parameter MO', 'Parameter Name', 'sector_type', 'advice', 'xtxr',
+}
+# Columns holding the same kind of value share one vocabulary (hwret renames site_name to site)
+_FAMILY = {'site_name': 'site'}
+ARROW_STRING = pd.ArrowDtype(pa.string())
+
+
+class Vocabulary:
+    """Append-only categories per column family, shared by every frame of a run."""
+
+    def __init__(self):
+        self._categories = {}
+        self._dtypes = {}
+        self._lock = threading.Lock()
+
+    def dtype(self, column, values=None) -> pd.CategoricalDtype:
+        """Current dtype of ``column``'s family, first extended with any new ``values``."""
+        family = _FAMILY.get(column, column)
+        with self._lock:
+            known = self._categories.setdefault(family, {})
+            if values is not None:
+                new = [v for v in pd.unique(values) if v not in known and not pd.isna(v)]
+                if new:
+                    known.update(dict.fromkeys(new))
+                    self._dtypes.pop(family, None)
+            if family not in self._dtypes:
+                self._dtypes[family] = pd.CategoricalDtype(list(known))
+            return self._dtypes[family]
+
+
+def _is_compact(series) -> bool:
+    return isinstance(series.dtype, pd.CategoricalDtype) or series.dtype == ARROW_STRING
+
+
+def compact(df: pd.DataFrame, vocab: Vocabulary) -> pd.DataFrame:
+    """Return ``df`` with string columns as categoricals (LOW_CARDINALITY) or pyarrow strings."""
+    out = df.copy(deep=False)
+    for col in df.columns:
+        s = df[col]
+        if col in LOW_CARDINALITY and (s.dtype == object or _is_compact(s)):
+            if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in ('string', 'empty'):
+                continue
+            values = s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.to_numpy()
+            out[col] = s.astype(object).astype(vocab.dtype(col, values))
+        elif s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) == 'string':
+            out[col] = s.astype(ARROW_STRING)
+    return out
+
+
+def align(df: pd.DataFrame, vocab: Vocabulary) -> pd.DataFrame:
+    """Re-cast categorical columns to the vocabulary's latest dtype so merges see identical categories."""
+    out = df.copy(deep=False)
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            out[col] = df[col].cat.set_categories(vocab.dtype(col).categories)
+    return out
+
+
+def restore(df: pd.DataFrame) -> pd.DataFrame:
+    """Return ``df`` with compact string columns back as object, missing values as None (as read_sql gives)."""
+    out = df.copy(deep=False)
+    for col in df.columns:
+        if _is_compact(df[col]):
+            values = df[col].astype(object)
+            out[col] = values.where(values.notna(), None)
+    return out
+
+
+_STR_BASE = sys.getsizeof('')
+_NONE_SIZE = sys.getsizeof(None)
+
+
+def _object_bytes(series) -> int:
+    """What ``restore`` would make of a compact column under ``memory_usage(deep=True)``, without building it.
+
+    One pointer per row plus the size of each row's str (or None). Arrow strings
+    are costed as ASCII: the str header plus their UTF-8 bytes.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        sizes = np.array([sys.getsizeof(v) for v in series.cat.categories] + [_NONE_SIZE], dtype='int64')
+        codes = series.cat.codes.to_numpy()
+        values = int(np.bincount(np.where(codes < 0, len(sizes) - 1, codes), minlength=len(sizes)) @ sizes)
+    else:
+        array = pa.array(series.array)  # the backing Arrow data, through __arrow_array__
+        missing = array.null_count
+        values = int(pc.sum(pc.binary_length(array)).as_py() or 0) + (len(array) - missing) * _STR_BASE + missing * _NONE_SIZE
+    return 8 * len(series) + values
+
+
+def memory_report(label, frames):
+    """Log the deep memory of ``frames`` next to an estimate of what the same data takes with object strings."""
+    for name, df in frames.items():
+        if not isinstance(df, pd.DataFrame):
+            continue
+        used = df.memory_usage(deep=True).sum()
+        as_object = sum(
+            _object_bytes(df[col]) if _is_compact(df[col]) else df[col].memory_usage(deep=True, index=False)
+            for col in df.columns
+        ) + df.index.memory_usage(deep=True)
+        logging.info("Memory %-28s %9.1f MB (object dtypes %9.1f MB, %4.1fx)", name if name == label else f"{label}:{name}",
+                     used / 2**20, as_object / 2**20, as_object / max(used, 1))
+
+
+def columnar_stages(stages: dict, vocab: Vocabulary, compact_inputs=(), report: bool = False) -> dict:
+    """Wrap ``{name: (func, inputs, outputs)}`` stages so their outputs are stored compact.
+
+    Stages named in ``compact_inputs`` receive their frames compact (aligned to
+    ``vocab``); all others receive object-dtype copies via ``restore``. With
+    ``report`` every stage's outputs go through ``memory_report``.
+    """
+    def wrap(name, func, outputs):
+        def run(*args):
+            prepare = (lambda df: align(df, vocab)) if name in compact_inputs else restore
+            args = [prepare(a) if isinstance(a, pd.DataFrame) else a for a in args]
+            result = func(*args)
+            results = result if len(outputs) > 1 else (result,)
+            results = tuple(compact(r, vocab) if isinstance(r, pd.DataFrame) else r for r in results)
+            if report:
+                memory_report(name, dict(zip(outputs, results)))
+            return results if len(outputs) > 1 else results[0]
+        return run
+
+    return {name: (wrap(name, func, outputs), inputs, outputs) for name, (func, inputs, outputs) in stages.items()}
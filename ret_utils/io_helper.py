@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
 import re
 from pathlib import Path
 
+import db_utils
+
 def get_site_name(cell_name):
     match_device = re.search(r'[A-Z]{3,4}\d{3,4}', cell_name)
     if match_device:
@@ -29,51 +32,66 @@ def load_cell_list(csv_path: str) -> pd.DataFrame:
 
 #  Query-helper & mapping utilities (NEW):
 # -------------------------------------------------------------------
-def generate_where_clause(site_ids):
-    site_ids_str = "', '".join(site_ids)
-    clause_site   = f"site IN ('{site_ids_str}')"
-    clause_nodeid = f"left(nodeid,7) IN ('{site_ids_str}')"
-    clause_site2  = f"site_name IN ('{site_ids_str}')"
-    return clause_site, clause_nodeid, clause_site2
-
-
 def fetch_data(sql: str, conn):
     """Run a raw SQL query via an open psycopg2/SQLAlchemy connection."""
-    return pd.read_sql_query(sql, conn)
-
-
-def tuning_band_logic(system: str) -> str:
-    if system in ("L1800", "L2100"):
-        return "MB"
-    if system in ("L700", "L900", "NR700"):
-        return "LB"
-    if system in ("L2600", "NR2600"):
-        return "2600"
-    if system == "L2300":
-        return "L2300"
-    return "Unknown"
-
-def suggestion(xtxr,vendor, antenna_type, is_lte=True):
-    bfant = ['AAU5639', 'AAU5614', 'AAU5636']
-    sectorsplitcell = ['AAU5711a', 'AAU5726']
-    if vendor == 'Huawei':
-        if is_lte: 
-            if any(item in antenna_type for item in bfant):
-                return 'BFANT'
-            elif any(item in antenna_type for item in sectorsplitcell):
-                return 'SECTORSPLITCELL'
-            else:
-                return 'RETSUBUNIT'
-        else:
-            if xtxr.upper() != '64T64R':
-                return 'RETSUBUNIT'
-            else:
-                return 'NRDUCELLTRPBEAM'
-    elif vendor == 'Ericsson':
-        if 'AIR' in antenna_type:
-            return 'AIR (SectorCarrier)'
-        else:
-            return 'NON_AIR (ElectricalTilt)'
-    else:
-        return 'TBD'
+    return db_utils.read_sql(sql, conn)
+
+
+def _any_of(*models):
+    """One compiled pattern matching any of ``models`` as a substring."""
+    return re.compile("|".join(map(re.escape, models)))
+
+
+# Suggestion rules, first match wins: (suggestion, vendor, rat, column, pattern).
+# rat is 'LTE', 'NR' or None for both; a rule with no column matches every row of its vendor and rat.
+# A new antenna model family is one more entry ahead of its vendor's catch-all rule.
+SUGGESTION_RULES = (
+    ('BFANT', 'Huawei', 'LTE', 'antenna_type', _any_of('AAU5639', 'AAU5614', 'AAU5636')),
+    ('SECTORSPLITCELL', 'Huawei', 'LTE', 'antenna_type', _any_of('AAU5711a', 'AAU5726')),
+    ('RETSUBUNIT', 'Huawei', 'LTE', None, None),
+    ('NRDUCELLTRPBEAM', 'Huawei', 'NR', 'xtxr', re.compile(r'\A64T64R\Z', re.IGNORECASE)),
+    ('RETSUBUNIT', 'Huawei', 'NR', None, None),
+    ('AIR (SectorCarrier)', 'Ericsson', None, 'antenna_type', _any_of('AIR')),
+    ('NON_AIR (ElectricalTilt)', 'Ericsson', None, None, None),
+)
+
+
+def _matches(values: pd.Series, pattern) -> np.ndarray:
+    """``values.str.contains(pattern)`` with missing values as False, searched once per distinct value."""
+    codes, uniques = pd.factorize(values)
+    hits = pd.Series(uniques, dtype=object).str.contains(pattern, na=False).to_numpy(dtype=bool)
+    return np.append(hits, False)[codes]
+
+
+def suggestion(xtxr: pd.Series, vendor: pd.Series, antenna_type: pd.Series, is_lte=True) -> pd.Series:
+    """Suggested tilt MO per row from SUGGESTION_RULES; rows no rule matches get 'TBD'.
+
+    ``is_lte`` is a bool for the whole frame or a boolean array per row.
+    """
+    columns = {'xtxr': xtxr, 'antenna_type': antenna_type}
+    is_lte = np.broadcast_to(np.asarray(is_lte, dtype=bool), len(vendor))
+    rats = {'LTE': is_lte, 'NR': ~is_lte}
+    vendors = {name: (vendor == name).to_numpy(dtype=bool) for name in {rule[1] for rule in SUGGESTION_RULES}}
+    conditions = []
+    for _, rule_vendor, rat, column, pattern in SUGGESTION_RULES:
+        mask = vendors[rule_vendor]
+        if rat is not None:
+            mask = mask & rats[rat]
+        if column is not None:
+            mask = mask & _matches(columns[column], pattern)
+        conditions.append(mask)
+    choices = [rule[0] for rule in SUGGESTION_RULES]
+    return pd.Series(np.select(conditions, choices, default='TBD'), index=vendor.index, dtype=object)
+
+
+def pivot_history(df: pd.DataFrame, index: list, values: str, wide: bool = False) -> pd.DataFrame:
+    """Return tilt history with one row per `index` combination and one column per date.
 
+    With `wide=True` the frame already came back pivoted from the server (see
+    `scripts.query_db._wide_by_date`), so only the columns are reordered to
+    `index` followed by the dates. Otherwise the long frame is pivoted locally.
+    """
+    if wide:
+        date_cols = [c for c in df.columns if c not in index]
+        return df[index + date_cols]
+    return df.pivot(index=index, columns='date', values=values).reset_index()
@@ -1,6 +1,30 @@
+import numpy as np
 import pandas as pd
 import re
 
+from ret_utils.bands import (
+    AIR_NODE_BANDS, AIR_PREFIX_BANDS, HUAWEI_BAND_RANK, HUAWEI_BAND_TOKEN, HUAWEI_TOKEN_BANDS,
+    NONAIR_LABEL_BAND, NONAIR_LABEL_BANDS, lte_cell_band, map_band,
+)
+
+# Cell name formats: 14 characters "X-Y-<carrier><sector letter>", or any other
+# length "..._<type><sector>..." where only the last '_' part is read
+_LTE_CELL = re.compile(
+    r'^(?:(?=.{14}\Z)[^-]*-[^-]*-([^-]*)'
+    r'|(?!.{14}\Z).*(_)(?:([A-Z])(\d+))?[^_]*)\Z',
+    re.DOTALL,
+)
+
+
+def _inferred_int_column(values, missing, index):
+    """Build the column the old row-wise code produced from ints/None: int64, float64 or object."""
+    if len(values) and not missing.any():
+        return pd.Series(values, index=index, dtype='int64')
+    if not missing.all():
+        return pd.Series(np.where(missing, np.nan, values), index=index)
+    return pd.Series([None] * len(values), index=index, dtype=object)
+
+
 def lte_cell_normalized(df):
     """
     Processes the cell_name and system columns in the given DataFrame and adds new columns:
@@ -8,6 +32,10 @@ def lte_cell_normalized(df):
     - sector: Extracted sector (int), A-Z converted to 1-26 for len(cell_name)==14 or sector digits for len(cell_name)!=14.
     - sector_type: Extracted sector type (character, e.g., S, M, C, E) for len(cell_name)!=14.
     - tuning_band: Mapped tuning band from the system column.
+
+    cell_name is factorized and only its distinct values are parsed, with one
+    whole-column regex extraction. carrier keeps the dtype the old row-wise
+    version inferred (see ``_inferred_int_column``).
     
     Args:
         df (pd.DataFrame): Input DataFrame with columns 'cell_name' and 'system'.
@@ -15,54 +43,95 @@ def lte_cell_normalized(df):
     Returns:
         pd.DataFrame: Updated DataFrame with the new columns added.
     """
-    system_mapping = {
-        'L700': 'LB',
-        'L900': 'LB',
-        'L1800': 'MB',
-        'L2100': 'MB',
-        'L2600' : '2600'
-    }
-
-    def process_cell_name(cell_name):
-        result = {'carrier': None, 'sector': None, 'sector_type': None}
-        if len(cell_name) == 14:
-            parts = cell_name.split('-')
-            if len(parts) == 3:
-                last_group = parts[-1]
-                carrier = ''.join(filter(str.isdigit, last_group))
-                sector_char = ''.join(filter(str.isalpha, last_group))
-                if carrier.isdigit() and len(sector_char) == 1:
-                    result['carrier'] = int(carrier)
-                    result['sector'] = ord(sector_char.upper()) - 64
-        else:
-            parts = cell_name.split('_')
-            if len(parts) > 1:
-                result['carrier'] = 1
-                last_part = parts[-1]
-                match = re.match(r'([A-Z])(\d+)', last_part)
-                if match:
-                    sector_type, sector_digits = match.groups()
-                    result['sector'] = int(sector_digits)
-                    result['sector_type'] = sector_type
-        return result
-
-    processed_data = df['cell_name'].apply(process_cell_name)
-    df['carrier'] = processed_data.apply(lambda x: x['carrier'])
-    df['sector'] = processed_data.apply(lambda x: x['sector'])
-    df['sector_type'] = processed_data.apply(lambda x: x['sector_type'])
-    df['sector'] = df['sector'].astype(pd.Int64Dtype())
-    df['tuning_band'] = df['system'].apply(lambda x: system_mapping.get(x, x))
+    codes, uniques = pd.factorize(df['cell_name'], use_na_sentinel=False)
+    parts = pd.Series(uniques, dtype=object).str.extract(_LTE_CELL)
+
+    # 14-char format: carrier = all digits of the last '-' group, sector = its single letter
+    digits = parts[0].str.replace(r'\D+', '', regex=True)
+    letters = parts[0].str.replace(r'[\W\d_]+', '', regex=True)
+    is_dash = ((digits.str.len() > 0) & (letters.str.len() == 1)).to_numpy()
+    # Other names: carrier 1 whenever there is a '_', sector/type from the last '_' part
+    has_underscore = parts[1].notna().to_numpy()
+    is_typed = parts[3].notna().to_numpy()
+
+    carrier = np.full(len(uniques), np.nan)
+    carrier[is_dash] = digits[is_dash].astype('int64')
+    carrier[has_underscore] = 1
+    sector = np.zeros(len(uniques), dtype='int64')
+    sector[is_dash] = np.asarray(letters[is_dash].str.upper(), dtype='U1').view(np.uint32) - 64
+    sector[is_typed] = parts.loc[is_typed, 3].astype('int64')
+    sector_type = parts[2].to_numpy(dtype=object)
+    sector_type[~is_typed] = None
+
+    carrier, carrier_missing = carrier[codes], np.isnan(carrier)[codes]
+    df['carrier'] = _inferred_int_column(np.nan_to_num(carrier).astype('int64'), carrier_missing, df.index)
+    df['sector'] = pd.arrays.IntegerArray(sector[codes], ~(is_dash | is_typed)[codes])
+    df['sector_type'] = sector_type[codes]
+
+    df['tuning_band'] = lte_cell_band(df['system'])
     return df
  
 
 
 
+# sectorcarrierid formats: "<sector><carrier>" (2 digits) and "<band>-S<sector>C<carrier>"
+_AIR_TWO_DIGIT = re.compile(r'^(\d)(\d)$')
+_AIR_BAND_DETAIL = re.compile(r'^([^-]*)-([^-]*)$')
+_AIR_DETAIL_SECTOR = re.compile(r'^[^S]*S([^SC]*)')
+_AIR_DETAIL_CARRIER = re.compile(r'^[^C]*C([^C]*)')
+# What int() accepts once the '-' split has removed any sign
+_INT_LITERAL = re.compile(r'^\s*\+?(\d+(?:_\d+)*)\s*$')
+
+
+def _int_literal(values):
+    """Parse a string Series the way int() would; returns (int64 values, valid mask)."""
+    digits = values.str.extract(_INT_LITERAL, expand=False)
+    valid = digits.notna().to_numpy()
+    parsed = np.zeros(len(values), dtype='int64')
+    parsed[valid] = digits[valid].str.replace('_', '', regex=False).astype('int64')
+    return parsed, valid
+
+
+def _parse_sectorcarrierids(values):
+    """Parse distinct sectorcarrierid strings into sector/carrier/band arrays.
+
+    Returns (sector, carrier, parsed, is_two_digit, band); ``band`` is None for
+    2-digit ids, whose band depends on the nodeid instead.
+    """
+    value = values.str.strip()
+
+    # 2-digit "<sector><carrier>"
+    two_digit = value.str.extract(_AIR_TWO_DIGIT)
+    is_two_digit = two_digit[0].notna().to_numpy()
+
+    # 'L23-S03C2' format: band from the prefix, sector after 'S' and carrier after 'C'
+    band_detail = value.str.extract(_AIR_BAND_DETAIL)
+    detail = band_detail[1].where(~is_two_digit)
+    sector, sector_ok = _int_literal(detail.str.extract(_AIR_DETAIL_SECTOR, expand=False))
+    carrier, carrier_ok = _int_literal(detail.str.extract(_AIR_DETAIL_CARRIER, expand=False))
+    is_band_detail = sector_ok & carrier_ok
+
+    sector[is_two_digit] = two_digit.loc[is_two_digit, 0].astype('int64')
+    carrier[is_two_digit] = two_digit.loc[is_two_digit, 1].astype('int64')
+    band = np.where(
+        is_band_detail,
+        map_band(band_detail[0], AIR_PREFIX_BANDS, 'manual check').to_numpy(dtype=object),
+        'manual check',
+    ).astype(object)
+    band[is_two_digit] = None
+    return sector, carrier, is_two_digit | is_band_detail, is_two_digit, band
+
+
 def eric_air(df, sectorcarrierid_col, nodeid_col):
     """
     Processes a DataFrame to extract sector, carrier, and system information 
     from the specified sectorcarrierid and nodeid columns. Additionally, adds 
     'score' and 'advice' based on the length of sectorcarrierid.
 
+    sectorcarrierid is factorized and only its distinct values are parsed, with
+    whole-column regex extraction; bands use Series.map lookups and advice uses
+    groupby().transform.
+
     Args:
         df (pd.DataFrame): Input DataFrame.
         sectorcarrierid_col (str): Name of the column containing sectorcarrierid data.
@@ -72,195 +141,244 @@ def eric_air(df, sectorcarrierid_col, nodeid_col):
         pd.DataFrame: DataFrame with additional columns: 'sector', 'carrier', 'system', 
                       'score', and 'advice'.
     """
-    def process_sectorcarrierid(value, nodeid_value):
-        result = {'sector': None, 'carrier': None, 'tuning_band': None}
-        
-        # Ensure value is treated as a string
-        value = str(value).strip()
-        
-        # Check if value is a 2-digit number
-        if value.isnumeric() and len(value) == 2:
-            result['sector'] = int(value[0])  # First digit as 'sector' (int)
-            result['carrier'] = int(value[1])  # Second digit as 'carrier' (int)
-            
-            # Determine 'system' based on nodeid_value
-            system_mapping = {
-                'L23': 'L2300',
-                'L21': 'MB'
-            }
-            system_key = str(nodeid_value)[-3:]  # Extract last 3 characters of nodeid
-            result['tuning_band'] = system_mapping.get(system_key, 'manual check')
-        elif '-' in value:
-            # Check for 'L23-S03C2' kind of format
-            parts = value.split('-')
-            if len(parts) == 2 and 'S' in parts[1] and 'C' in parts[1]:
-                system_part, detail_part = parts[0], parts[1]
-                
-                # Mapping 'system' values
-                system_mapping = {
-                    'L23': 'L2300', 'L33': 'L2300', 
-                    'L18': 'MB', 'L21': 'MB', 
-                    'L07': 'LB', 'L09': 'LB'
-                }
-                result['tuning_band'] = system_mapping.get(system_part, 'manual check')
-                
-                # Extract 'sector' and 'carrier'
-                try:
-                    sector = detail_part.split('S')[1].split('C')[0]
-                    carrier = detail_part.split('C')[1]
-                    result['sector'] = int(sector)  # Convert to int
-                    result['carrier'] = int(carrier)  # Convert to int
-                except (IndexError, ValueError):
-                    return {'sector': None, 'carrier': None, 'tuning_band': 'manual check'}
-            else:
-                return {'sector': None, 'carrier': None, 'tuning_band': 'manual check'}
-        else:
-            return {'sector': None, 'carrier': None, 'tuning_band': 'manual check'}
-        
-        return result
-
     # Ensure the sectorcarrierid column is string
     df[sectorcarrierid_col] = df[sectorcarrierid_col].astype(str)
-    
-    # Process each row
-    processed_data = df.apply(
-        lambda row: process_sectorcarrierid(row[sectorcarrierid_col], row[nodeid_col]), axis=1
+    codes, uniques = pd.factorize(df[sectorcarrierid_col])
+    uniques = pd.Series(uniques, dtype=object)
+    sector, carrier, parsed, is_two_digit, band = (
+        arr[codes] for arr in _parse_sectorcarrierids(uniques)
     )
-    
-    # Ensure processed_data is consistent
-    processed_data = processed_data.apply(
-        lambda x: x if isinstance(x, dict) else {'sector': None, 'carrier': None, 'tuning_band': 'manual check'}
-    )
-    
-    # Unpack the dictionary into separate columns
-    processed_df = pd.DataFrame(processed_data.tolist())
-    
-    # Convert 'sector' and 'carrier' columns to integers
-    processed_df['sector'] = processed_df['sector'].astype(pd.Int64Dtype())
-    processed_df['carrier'] = processed_df['carrier'].astype(pd.Int64Dtype())
-    
+
+    # 2-digit ids take their band from the last 3 characters of nodeid
+    node_codes, node_uniques = pd.factorize(df[nodeid_col], use_na_sentinel=False)
+    node_uniques = pd.Series(node_uniques, dtype=object)
+    node_band = map_band(node_uniques.astype(str).str[-3:], AIR_NODE_BANDS, 'manual check')
+    tuning_band = np.where(is_two_digit, node_band.to_numpy(dtype=object)[node_codes], band)
+
     # Add 'score' column based on the length of sectorcarrierid
-    df['score'] = df[sectorcarrierid_col].apply(lambda x: 0 if len(x) in (2, 8, 9) else 1)
+    df['score'] = np.where(uniques.str.len().isin([2, 8, 9]).to_numpy()[codes], 0, 1)
     
     # Add 'site' column (first 7 characters of nodeid)
-    df['site'] = df[nodeid_col].apply(lambda x: x[:7])
-    
-    # Group by site and calculate advice
-    advice_df = (
-        df.groupby('site')['score']
-        .sum()
-        .reset_index()
-        .rename(columns={'score': 'total_score'})
-    )
-    advice_df['advice'] = advice_df['total_score'].apply(lambda x: 'OK' if x == 0 else 'manual check')
+    df['site'] = node_uniques.str[:7].to_numpy(dtype=object)[node_codes]
     
-    # Merge advice back into the original DataFrame
-    df = pd.merge(df, advice_df[['site', 'advice']], on='site', how='left')
-    
-    # Combine with the processed data
-    result_df = pd.concat([df, processed_df], axis=1)
+    # Site-level advice: OK only when every sectorcarrierid on the site scores 0
+    total_score = df.groupby('site')['score'].transform('sum')
+    result_df = df.reset_index(drop=True)
+    result_df.columns.name = None
+    result_df['advice'] = np.where(total_score.to_numpy() == 0, 'OK', 'manual check').astype(object)
+
+    result_df['sector'] = pd.arrays.IntegerArray(sector, ~parsed)
+    result_df['carrier'] = pd.arrays.IntegerArray(carrier, ~parsed)
+    result_df['tuning_band'] = tuning_band
     return result_df
 
 
 
 
 
+# Huawei device_name band tokens: see ret_utils.bands
+_HW_NUMERIC_SECTOR = re.compile(r'[Ss](\d{1,3})')                # S[digit]
+_HW_ALPHA_SECTOR = re.compile(r'_S([A-Z])(?![A-Z0-9])')          # _S[A-Z]
+# device_name of a RET that follows the naming convention
+_HW_USAGE_NAME = re.compile(r'^(HB|LB|2300|2600|2100|850|1800)_SET[1-4]_S\d{1,3}$')
+
+
+def _hw_band_sectors(names):
+    """Map distinct device names to their (band, sector) entries.
+
+    Returns aligned (device, band, sector) arrays, sorted by device. A device gets
+    one entry per band it mentions (in rule order, 'Other' if none); the i-th band
+    takes the i-th sector (numeric sectors first, then _S[A-Z]), or NaN.
+    """
+    n = len(names)
+
+    tokens = names.str.extractall(HUAWEI_BAND_TOKEN)[0]
+    bands = pd.DataFrame({
+        'device': tokens.index.get_level_values(0).to_numpy(dtype='int64'),
+        'band': map_band(tokens, HUAWEI_TOKEN_BANDS).to_numpy(),
+    }).drop_duplicates()
+    bands['rank'] = bands['band'].map(HUAWEI_BAND_RANK)
+    without_band = np.setdiff1d(np.arange(n), bands['device'].to_numpy())
+    bands = pd.concat([bands, pd.DataFrame({'device': without_band, 'band': 'Other', 'rank': 0})])
+    bands = bands.sort_values(['device', 'rank'], kind='stable')
+    bands['position'] = bands.groupby('device').cumcount()
+
+    numeric = names.str.extractall(_HW_NUMERIC_SECTOR)[0]
+    alpha = names.str.extractall(_HW_ALPHA_SECTOR)[0]
+    numeric_count = numeric.groupby(level=0).size().reindex(range(n), fill_value=0).to_numpy()
+    alpha_device = alpha.index.get_level_values(0).to_numpy(dtype='int64')
+    sectors = pd.DataFrame({
+        'device': np.concatenate([numeric.index.get_level_values(0).to_numpy(dtype='int64'), alpha_device]),
+        'position': np.concatenate([
+            numeric.index.get_level_values(1).to_numpy(dtype='int64'),
+            numeric_count[alpha_device] + alpha.index.get_level_values(1).to_numpy(dtype='int64'),
+        ]),
+        'sector': np.concatenate([
+            numeric.astype('int64').to_numpy(),
+            np.array(alpha.tolist(), dtype='U1').view(np.uint32).astype('int64') - 64,
+        ]),
+    })
+
+    mapped = bands.merge(sectors, on=['device', 'position'], how='left')
+    return mapped['device'].to_numpy(), mapped['band'].to_numpy(dtype=object), mapped['sector'].to_numpy()
+
+
 def hwret(df_hw):
     """
     Processes the input DataFrame to classify tuning bands, numeric sectors (S[digit]),
     and character-based sectors (_S[A-Z]), ensuring they are handled separately.
 
+    Bands and sectors are found once per distinct device_name with precompiled
+    regex passes, each row is repeated once per (band, sector) entry of its name,
+    as DataFrame.explode would, and usage is a set membership test against the
+    device names that follow the naming convention.
+
     Args:
         df_hw (pd.DataFrame): Input DataFrame with at least a 'device_name' column.
 
     Returns:
         pd.DataFrame: Expanded DataFrame with tuning bands, sectors, usage, and classification.
     """
-    # Define tuning band regex patterns
-    tuning_band_rules = [
-        (r'(?<!\b[a-zA-Z]{3})(?<!\b[a-zA-Z]{4})(850)', '850'),
-        (r'(?<!\b[a-zA-Z]{3})(?<!\b[a-zA-Z]{4})(700|900|LB)', 'LB'),
-        (r'(?<!\b[a-zA-Z]{3})(?<!\b[a-zA-Z]{4})(1800|2100|HB)', 'MB'),
-        (r'(?<!\b[a-zA-Z]{3})(?<!\b[a-zA-Z]{4})(2300)', 'L2300'),
-        (r'(?<!\b[a-zA-Z]{3})(?<!\b[a-zA-Z]{4})(2600)', 'L2600'),
-    ]
-
-    # Regex pattern for valid device_name rows
-    pattern = r'^(HB|LB|2300|2600|2100|850|1800)_SET[1-4]_S\d{1,3}$'
-
     # Fill missing values in 'device_name'
     df_hw['device_name'] = df_hw['device_name'].fillna('')
 
-    # Create the usage words list
-    usage_words = df_hw[df_hw['device_name'].str.match(pattern)]['device_name'].tolist()
-
-    # Function to classify tuning bands and sectors for a single device
-    def classify_device(device_name):
-        # Extract tuning bands
-        tuning_bands = [result for pattern, result in tuning_band_rules if re.search(pattern, device_name)]
-        if not tuning_bands:
-            tuning_bands = ['Other']  # Default if no match
-
-        # Extract numeric sectors (S[digit])
-        numeric_sectors = re.findall(r'[Ss](\d{1,3})', device_name)
-        numeric_sectors = [int(s) for s in numeric_sectors] if numeric_sectors else []
-
-        # Extract character-based sectors (_S[A-Z])
-        char_sectors = re.findall(r'_S([A-Z])(?![A-Z0-9])', device_name)  # Match _S followed by a single letter
-        char_sectors_as_numbers = [ord(char) - 64 for char in char_sectors] if char_sectors else []
-
-        # Combine numeric and character-based sectors
-        all_sectors = numeric_sectors + char_sectors_as_numbers
-
-        # Ensure sectors align with tuning bands
-        mapped_sectors = []
-        for i, tuning_band in enumerate(tuning_bands):
-            if i < len(all_sectors):
-                mapped_sectors.append((tuning_band, all_sectors[i]))
-            else:
-                mapped_sectors.append((tuning_band, None))  # No sector available for this tuning band
-
-        # Check if device_name is in usage_words
-        usage = 0 if device_name in usage_words else 1
-
-        return mapped_sectors, usage
-
-    # Expand rows with tuning bands and sectors
-    def expand_rows(row):
-        mapped_sectors, usage = classify_device(row['device_name'])
-        expanded_rows = []
-        for tuning_band, sector in mapped_sectors:
-            new_row = row.copy()  # Copy the original row
-            new_row['tuning_band'] = tuning_band
-            new_row['sector'] = sector
-            new_row['usage'] = usage
-            expanded_rows.append(new_row)
-        return expanded_rows
-
-    # Process each row and flatten the expanded rows
-    expanded_data = []
-    for _, row in df_hw.iterrows():
-        expanded_data.extend(expand_rows(row))
-
-    # Create the expanded DataFrame
-    df_expanded = pd.DataFrame(expanded_data)
+    codes, names = pd.factorize(df_hw['device_name'])
+    names = pd.Series(names, dtype=object)
+
+    # Create the usage words set
+    usage_words = set(names[names.str.match(_HW_USAGE_NAME)])
+    usage = np.where(names.isin(usage_words), 0, 1)[codes]
+
+    device, band, sector = _hw_band_sectors(names)
+
+    # Expand rows with tuning bands and sectors: row i takes every entry of its name, in order
+    entries = np.bincount(device, minlength=len(names))
+    first_entry = np.cumsum(entries) - entries
+    repeats = entries[codes]
+    rows = np.repeat(np.arange(len(df_hw)), repeats)
+    entry = np.repeat(first_entry[codes], repeats) + np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+    df_expanded = df_hw.iloc[rows].assign(
+        tuning_band=band[entry],
+        sector=sector[entry],
+        usage=usage[rows],
+    )
+
+    sector = df_expanded['sector'].to_numpy()
+    missing = pd.isna(sector)
+    df_expanded['tuning_band'] = df_expanded['tuning_band'].astype(object)
+    df_expanded['sector'] = _inferred_int_column(
+        np.where(missing, 0, sector).astype('int64'), missing, df_expanded.index
+    )
+    df_expanded['usage'] = df_expanded['usage'].astype('int64')
 
     # Group by 'site_name' and sum 'usage' to classify as OK or Care
-    usage_summary = df_expanded.groupby('site_name')['usage'].sum()
-    classification = usage_summary.apply(lambda x: 'OK' if x == 0 else 'manual check')
-    df_expanded['advice'] = df_expanded['site_name'].map(classification)
+    usage_summary = df_expanded.groupby('site_name')['usage'].transform('sum')
+    df_expanded['advice'] = pd.Series(
+        np.where(usage_summary == 0, 'OK', 'manual check'), index=df_expanded.index, dtype=object
+    ).where(usage_summary.notna())
 
     return df_expanded
 
 
 
+# userlabel such as 'L18_S1+L21_S1_By_Triplexer' holds one part per band
+_NONAIR_PART_SPLIT = re.compile(r'\+|_By_|_by_')
+_NONAIR_SKIP_PARTS = ['Triplexer', 'Diplexer']
+# First band, first alpha sector and first numeric sector of a part, in one pass
+_NONAIR_PART_FIELDS = re.compile(
+    rf'^(?=(?:.*?{NONAIR_LABEL_BAND})?)'
+    r'(?=(?:.*?S([A-Z]))?)'
+    r'(?=(?:.*?S(\d{1,2}))?)',
+    re.DOTALL,
+)
+# Naming conventions a userlabel part must follow to count as used
+_NONAIR_VALID_PART = re.compile(
+    r'^(?:L\d{2}_S\d{1,2}'
+    r'|UL\d{2}_S\d{1,2}'
+    r'|U09/L07_S\d{1,2}'
+    r'|L\d{2}_S[A-Z]'
+    r'|G\d{2}_S\d{1,2}'
+    r'|U\d{2}_S\d{1,2})$'
+)
+# What str(value).replace('.', '', 1).isdigit() accepts
+_NUMERIC_ID = re.compile(r'^(?:\d+\.?\d*|\.\d+)$')
+
+
+def _nonair_label_parts(labels):
+    """Split distinct userlabels into parts and resolve each part's band and sector.
+
+    Returns (band_lists, sector_lists, usage) aligned with ``labels``: the bands and
+    sectors of the parts that carry either (one (None, None) entry if none do), and
+    usage 1 when any part breaks the naming convention.
+    """
+    n = len(labels)
+    # Only strings are labels; anything else (numbers, NaN) is masked so the .str accessor always applies
+    labels = labels.astype(object).where([isinstance(value, str) for value in labels], None)
+    length = labels.str.len()
+    is_label = (length > 0).to_numpy()
+
+    # Skip empty parts or known suffixes
+    parts = labels[is_label].str.split(_NONAIR_PART_SPLIT).explode()
+    stripped = parts.str.strip()
+    kept_part = ((parts != '') & ~stripped.isin(_NONAIR_SKIP_PARTS)).to_numpy()
+    parts, stripped = parts[kept_part], stripped[kept_part]
+    label = parts.index.to_numpy(dtype='int64')
+
+    # usage: non-string labels and labels with any non-conforming part
+    invalid = ~stripped.str.match(_NONAIR_VALID_PART).to_numpy(dtype=bool)
+    usage = np.where(length.notna(), 0, 1)
+    usage[np.unique(label[invalid])] = 1
+
+    fields = parts.str.extract(_NONAIR_PART_FIELDS)
+    band = map_band(fields[0], NONAIR_LABEL_BANDS)
+    alpha = fields[1].notna()
+    sector = fields[2].astype('float64')
+    sector[alpha] = [ord(c) - 64 for c in fields.loc[alpha, 1]]
+    keep = (band.notna() | (sector.fillna(0) != 0)).to_numpy()
+
+    band_lists = np.empty(n, dtype=object)
+    sector_lists = np.empty(n, dtype=object)
+    band_values = band.astype(object).where(band.notna(), None).to_numpy()[keep]
+    sector_values = sector.astype(object).where(sector.notna(), None).to_numpy()[keep]
+    kept_label = label[keep]
+    bounds = np.flatnonzero(np.diff(kept_label)) + 1
+    for idx, bands, sectors in zip(
+        kept_label[np.r_[0, bounds]] if len(kept_label) else [],
+        np.split(band_values, bounds),
+        np.split(sector_values, bounds),
+    ):
+        band_lists[idx] = list(bands)
+        sector_lists[idx] = [int(v) if v is not None else None for v in sectors]
+    for idx in np.flatnonzero(pd.isna(band_lists)):
+        band_lists[idx] = [None]
+        sector_lists[idx] = [None]
+    return band_lists, sector_lists, usage
+
+
+def _convert_antennaunitgroupid(values):
+    """Turn numeric-looking ids ('1', '1.0') into ints, leaving other values as they are."""
+    # Missing values keep their own object (None stays None, NaN stays NaN), as factorize would merge them
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Series(uniques, dtype=object)
+    text = uniques.astype(str)
+    numeric = text.str.match(_NUMERIC_ID).to_numpy(dtype=bool)
+    converted = uniques.to_numpy(dtype=object, copy=True)
+    converted[numeric] = text[numeric].astype('float64').astype('int64').to_numpy(dtype=object)
+    result = values.to_numpy(dtype=object, copy=True)
+    present = codes >= 0
+    result[present] = converted[codes[present]]
+    # Match the dtype Series.apply would infer (int64, float64 when mixed with NaN, else object)
+    return pd.Series(result, index=values.index, dtype=object).infer_objects()
+
+
 def eric_non_air(df):
     """
     Enhanced version of eric_non_air function with support for multiple tuning bands in userlabel
-    """
-    import re
-    import pandas as pd
 
+    Each distinct userlabel is split into its parts with str.split + explode, band and
+    sector come from one compiled pattern, and usage from one combined anchored regex.
+    Rows are then expanded with DataFrame.explode over the per-label results.
+    """
     # Early exit for empty DataFrame
     if df.empty:
         print("Eric_non_air DataFrame is empty. Returning an empty DataFrame.")
@@ -268,100 +386,16 @@ def eric_non_air(df):
             'site', 'userlabel', 'antennanearunitid', 'retsubunitid', 'antennaunitgroupid',
             'tuning_band', 'sector', 'Parameter MO', 'usage', 'advice', 'Parameter Name'
         ])
-    
-    def letter_to_number(letter):
-        """Convert single letter to number (A=1, B=2, etc)"""
-        return ord(letter.upper()) - ord('A') + 1
-
-    def extract_tuning_band_and_sector(userlabel):
-        results = []
-        if not userlabel or not isinstance(userlabel, str):
-            return [{'tuning_band': None, 'sector': None}]
-
-        # Handle multiple tuning band cases
-        parts = re.split(r'\+|_By_|_by_', userlabel)
-        
-        for part in parts:
-            # Skip empty parts or known suffixes
-            if not part or part.strip() in ['Triplexer', 'Diplexer']:
-                continue
-
-            tuning_band = None
-            sector = None
-
-            # Extract tuning bands
-            band_match = re.search(r'(?<![A-Z]{2})L(07|7|09|9|18|21|23)', part)
-            if band_match:
-                band = band_match.group(1)
-                tuning_band_mapping = {
-                    '07': 'LB', '7': 'LB',
-                    '09': 'LB', '9': 'LB',
-                    '18': 'MB',
-                    '21': 'MB',
-                    '23': 'L2300'
-                }
-                tuning_band = tuning_band_mapping.get(band)
-
-            # First check for alpha sectors
-            alpha_sector = re.search(r'S([A-Z])', part)
-            if alpha_sector:
-                sector = letter_to_number(alpha_sector.group(1))
-            else:
-                # Then check for numeric sectors
-                numeric_sector = re.search(r'S(\d{1,2})', part)
-                if numeric_sector:
-                    sector = int(numeric_sector.group(1))
-
-            if tuning_band or sector:
-                results.append({'tuning_band': tuning_band, 'sector': sector})
-
-        return results if results else [{'tuning_band': None, 'sector': None}]
-
-    def expand_rows(row):
-        userlabel = row['userlabel']
-        extracted = extract_tuning_band_and_sector(userlabel)
-        expanded_rows = []
-        for result in extracted:
-            new_row = row.copy()
-            new_row['tuning_band'] = result['tuning_band']
-            new_row['sector'] = result['sector']
-            expanded_rows.append(new_row)
-        return expanded_rows
-
-    def convert_antennaunitgroupid(value):
-        try:
-            return int(float(value)) if str(value).replace('.', '', 1).isdigit() else value
-        except:
-            return value
-
-    def check_pattern(userlabel):
-        if not isinstance(userlabel, str):
-            return 1
-            
-        parts = re.split(r'\+|_By_|_by_', userlabel)
-        parts = [p for p in parts if p and p.strip() not in ['Triplexer', 'Diplexer']]
-        
-        patterns = [
-            r'^L\d{2}_S\d{1,2}$',
-            r'^UL\d{2}_S\d{1,2}$',
-            r'^U09/L07_S\d{1,2}$',
-            r'^L\d{2}_S[A-Z]$',
-            r'^G\d{2}_S\d{1,2}$',
-            r'^U\d{2}_S\d{1,2}$'
-        ]
-        
-        for part in parts:
-            if not any(re.match(pattern, part.strip()) for pattern in patterns):
-                return 1
-        return 0
-
-    # Apply the function to expand rows
-    expanded_data = []
-    for _, row in df.iterrows():
-        expanded_data.extend(expand_rows(row))
-
-    # Create the expanded DataFrame
-    df_expanded = pd.DataFrame(expanded_data)
+
+    codes, labels = pd.factorize(df['userlabel'], use_na_sentinel=False)
+    band_lists, sector_lists, usage = _nonair_label_parts(pd.Series(labels, dtype=object))
+
+    # Expand each row into one row per tuning band found in its userlabel
+    df_expanded = df.assign(
+        tuning_band=band_lists[codes],
+        sector=sector_lists[codes],
+    ).explode(['tuning_band', 'sector'])
+    df_expanded['tuning_band'] = df_expanded['tuning_band'].astype(object)
 
     # Convert columns to integers
     columns_to_convert = ['antennanearunitid', 'retsubunitid', 'sector']
@@ -369,7 +403,7 @@ def eric_non_air(df):
         df_expanded[column] = pd.to_numeric(df_expanded[column], errors='coerce').astype(pd.Int64Dtype())
 
     # Convert antennaunitgroupid
-    df_expanded['antennaunitgroupid'] = df_expanded['antennaunitgroupid'].apply(convert_antennaunitgroupid)
+    df_expanded['antennaunitgroupid'] = _convert_antennaunitgroupid(df_expanded['antennaunitgroupid'])
 
     # Create Parameter MO column
     df_expanded['Parameter MO'] = (
@@ -382,16 +416,17 @@ def eric_non_air(df):
     )
 
     # Add Pattern Match column (advice)
-    df_expanded['usage'] = df_expanded['userlabel'].apply(check_pattern)
-    
+    expanded_count = np.array([len(bands) for bands in band_lists])
+    df_expanded['usage'] = np.repeat(usage[codes], expanded_count[codes])
+
     # Add site-based advice (advice_1)
-    site_advice = df_expanded.groupby('site')['usage'].sum().reset_index()
-    site_advice['advice'] = site_advice['usage'].apply(lambda x: 'manual check' if x > 0 else 'OK')
-    df_expanded = df_expanded.merge(site_advice[['site', 'advice']], on='site', how='left')
+    site_usage = df_expanded.groupby('site')['usage'].transform('sum')
+    df_expanded = df_expanded.reset_index(drop=True)
+    df_expanded.columns.name = None
+    df_expanded['advice'] = pd.Series(
+        np.where(site_usage > 0, 'manual check', 'OK'), dtype=object
+    ).where(site_usage.notna().to_numpy())
 
     df_expanded['Parameter Name'] = "electricalAntennaTilt"
     
     return df_expanded
-
-
-
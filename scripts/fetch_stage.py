@@ -0,0 +1,35 @@
+"""Run independent fetch_data_* queries concurrently over the db_utils pool."""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db_utils
+
+
+def _run_fetch(name, func, args, profile=None):
+    """Check out a pooled connection, run one fetch function and log its timing."""
+    with db_utils.connection() as conn:
+        start = time.perf_counter()
+        df = profile.fetch(name, func, args, conn) if profile else func(*args, conn)
+        logging.info("Fetched %-18s %9d rows in %7.2fs", name, len(df), time.perf_counter() - start)
+        return df
+
+
+def run_fetches(jobs: dict, max_workers: int = None, profile=None) -> dict:
+    """Run ``{name: (fetch_func, args)}`` jobs in parallel and return ``{name: DataFrame}``.
+
+    Each fetch function is called as ``fetch_func(*args, conn)``, matching the
+    signatures in ``scripts.query_db``. Concurrency is capped by ``max_workers``
+    (default ``db_utils.DB_MAX_CONCURRENCY``), which is also the size of the
+    engine's connection pool, so no more than that many queries hit the server
+    at once. With a ``scripts.profiling.RunProfile`` each job is recorded as a
+    'fetch' span.
+    """
+    max_workers = max_workers or db_utils.DB_MAX_CONCURRENCY
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch") as pool:
+        futures = {name: pool.submit(_run_fetch, name, func, args, profile) for name, (func, args) in jobs.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    logging.info("Fetch stage: %d queries in %.2fs (max %d concurrent)",
+                 len(jobs), time.perf_counter() - start, max_workers)
+    return results
@@ -0,0 +1,164 @@
+"""Incremental on-disk cache of the daily tilt history behind the *_no_map fetches.
+
+Each history (``hw_no_map``, ``air_no_map``, ``non_air_no_map``) is kept as one
+Parquet file per date under ``<HISTORY_CACHE_DIR>/<name>/``, plus a
+``manifest.json`` recording which sites each date already holds. A run only
+queries the (date, site) pairs the manifest lacks, which after the first run of
+a window is normally just the newest day, and merges them with the cached days.
+Dates from today onward are fetched every time and never stored, as they may
+still be loading. Dates older than HISTORY_CACHE_KEEP_DAYS are pruned.
+
+Columns that come from other, mutable tables are never cached: ``hw_no_map``
+stores only the ``hwret_data`` rows and passes a ``join_func`` that adds
+max/min tilt from ``retdevicedata_1`` to the merged result on every run.
+
+    python -m scripts.history_cache list
+    python -m scripts.history_cache refresh --date 2024-07-03 [--name hw_no_map]
+"""
+import argparse
+import json
+import logging
+import os
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+CACHE_DIR = Path(os.getenv("HISTORY_CACHE_DIR", Path(__file__).resolve().parents[1] / "cache" / "history"))
+KEEP_DAYS = int(os.getenv("HISTORY_CACHE_KEEP_DAYS", "60"))
+NAMES = ("hw_no_map", "air_no_map", "non_air_no_map")
+SITE_COLUMN = "site_name"
+
+
+def _read_manifest(table_dir: Path) -> dict:
+    path = table_dir / "manifest.json"
+    if not path.exists():
+        return {}
+    return {day: set(sites) for day, sites in json.loads(path.read_text()).items()}
+
+
+def _write_manifest(table_dir: Path, manifest: dict):
+    tmp = table_dir / f"manifest.{os.getpid()}.tmp"
+    tmp.write_text(json.dumps({day: sorted(sites) for day, sites in sorted(manifest.items())}, indent=1))
+    os.replace(tmp, table_dir / "manifest.json")
+
+
+def _date_runs(days):
+    """Split sorted ISO dates into runs of consecutive days -> [(first, last), ...]."""
+    runs = []
+    for day in days:
+        if runs and date.fromisoformat(day) - date.fromisoformat(runs[-1][1]) == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def _store(table_dir: Path, manifest: dict, day: str, sites, rows: pd.DataFrame):
+    path = table_dir / f"{day}.parquet"
+    if path.exists():
+        cached = pd.read_parquet(path)
+        rows = pd.concat([cached[~cached[SITE_COLUMN].isin(sites)], rows], ignore_index=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    rows.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
+    manifest.setdefault(day, set()).update(sites)
+
+
+def _prune(table_dir: Path, manifest: dict):
+    oldest = (date.today() - timedelta(days=KEEP_DAYS)).isoformat()
+    for day in [d for d in manifest if d < oldest]:
+        (table_dir / f"{day}.parquet").unlink(missing_ok=True)
+        del manifest[day]
+
+
+def history_fetch(name, fetch_func, site_ids, start_date, end_date, conn, cache_dir: Path = CACHE_DIR,
+                  join_func=None):
+    """Long-format history for ``site_ids`` over [start_date, end_date], fetching only uncached days.
+
+    ``fetch_func(site_ids, start_date, end_date, conn)`` is one of the
+    ``fetch_data_*_no_map`` functions. The result matches a direct call except
+    for row order; ``date`` always holds ``datetime.date`` values.
+    ``join_func(rows, conn)``, if given, is applied to the merged rows and
+    adds the columns that must not be cached.
+    """
+    table_dir = cache_dir / name
+    table_dir.mkdir(parents=True, exist_ok=True)
+    manifest = _read_manifest(table_dir)
+    sites = set(site_ids)
+    days = pd.date_range(start_date, end_date).strftime("%Y-%m-%d").tolist()
+    today = date.today().isoformat()
+
+    # Group the missing days by which sites they lack, so one query covers each run of days
+    missing = {}
+    for day in days:
+        lacking = frozenset(sites - manifest.get(day, set())) if day < today else frozenset(sites)
+        if lacking:
+            missing.setdefault(lacking, []).append(day)
+
+    fresh = []
+    for lacking, lacking_days in missing.items():
+        for first, last in _date_runs(lacking_days):
+            rows = fetch_func(sorted(lacking), first, last, conn)
+            rows['date'] = pd.to_datetime(rows['date']).dt.date
+            logging.info("History %s: fetched %s..%s for %d sites, %d rows", name, first, last, len(lacking), len(rows))
+            by_day = dict(tuple(rows.groupby(rows['date'].astype(str)))) if len(rows) else {}
+            for day in pd.date_range(first, last).strftime("%Y-%m-%d"):
+                day_rows = by_day.get(day, rows.iloc[:0])
+                if day < today:
+                    _store(table_dir, manifest, day, lacking, day_rows)
+                else:
+                    fresh.append(day_rows)
+    _prune(table_dir, manifest)
+    _write_manifest(table_dir, manifest)
+
+    frames = []
+    for day in days:
+        path = table_dir / f"{day}.parquet"
+        if day < today and path.exists():
+            cached = pd.read_parquet(path)
+            frames.append(cached[cached[SITE_COLUMN].isin(sites)])
+    frames += fresh
+    if not frames:
+        rows = fetch_func(sorted(sites), start_date, end_date, conn)
+    else:
+        # Empty days carry no dtypes worth keeping; concatenating them would turn numeric columns into object
+        rows = pd.concat([f for f in frames if len(f)] or frames[:1], ignore_index=True)
+    return join_func(rows, conn) if join_func else rows
+
+
+def refresh(day, names=NAMES, cache_dir: Path = CACHE_DIR) -> list:
+    """Forget ``day`` in the given histories so the next run fetches it again; returns the names touched."""
+    touched = []
+    for name in names:
+        table_dir = cache_dir / name
+        manifest = _read_manifest(table_dir)
+        if day in manifest:
+            (table_dir / f"{day}.parquet").unlink(missing_ok=True)
+            del manifest[day]
+            _write_manifest(table_dir, manifest)
+            touched.append(name)
+    return touched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the daily tilt history cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="show cached dates per history")
+    ref = sub.add_parser("refresh", help="re-fetch a date on the next run")
+    ref.add_argument("--date", required=True, help="YYYY-MM-DD")
+    ref.add_argument("--name", choices=NAMES, help="only this history (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in NAMES:
+            for day, sites in sorted(_read_manifest(CACHE_DIR / name).items()):
+                print(f"{name:16s} {day}  {len(sites)} sites")
+    else:
+        day = date.fromisoformat(args.date).isoformat()
+        for name in refresh(day, (args.name,) if args.name else NAMES):
+            print(f"Refreshing {name} {day} on the next run")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,317 +1,400 @@
-
 import argparse, logging
-from config import build_cfg
-import importlib
+from contextlib import nullcontext
+from functools import partial
+from config import LOG_DIR, build_cfg
 import os
+import numpy as np
 import pandas as pd
-from pathlib import Path
-from scripts.db_connect import connect_postgres
-import zipfile
-from dotenv import load_dotenv
-from ret_utils.io_helper import load_cell_list, generate_where_clause, suggestion, tuning_band_logic
+from scripts.fetch_stage import run_fetches
+from scripts.history_cache import history_fetch
+from scripts.process_pool import StagePool, process_stages
+from scripts.profiling import RunProfile
+from scripts.snapshot_cache import snapshot_fetch
+from scripts.stage_graph import run_stages
+from scripts.zip_output import CsvSpool, write_csv_archives
+from ret_utils.cell_index import CellIndex, tuple_codes
+from ret_utils.columnar import Vocabulary, columnar_stages, compact, memory_report
+from ret_utils.bands import system_band
+from ret_utils.io_helper import load_cell_list, suggestion, pivot_history
 from ret_utils.ret_finding import lte_cell_normalized, eric_air, hwret, eric_non_air
-from scripts.query_db import fetch_data_lte, fetch_data_nr, fetch_data_air, fetch_data_non_air, fetch_data_hw, fetch_data_hw_no_map, fetch_data_air_no_map, fetch_data_nonair_no_map, fetch_data_bfant_tilt, fetch_data_nr_tilt, fetch_data_split_tilt
-
-env_path = Path(__file__).resolve().parents[1] / ".env"
-load_dotenv(dotenv_path=env_path)
-
-cluster_name = os.getenv("CLUSTER_NAME")
-week_name = os.getenv("WEEK_NUM")
-folder_name = cluster_name.split('_')[0]
+from scripts.query_db import fetch_data_lte, fetch_data_nr, fetch_data_air, fetch_data_non_air, fetch_data_hw, fetch_data_hw_no_map, fetch_data_air_no_map, fetch_data_nonair_no_map, fetch_data_bfant_tilt, fetch_data_nr_tilt, fetch_data_split_tilt, fetch_data_hwret_no_map, join_hw_tilt_limits
 
-INPUT_FILE_PATH = f'D:/D&T Project/CR Preparing/{folder_name}/Tuning_cell_list_{cluster_name}.csv'
 OUTPUT_BASE_DIR = f'D:/D&T Project/CR Preparing/'
 
-
-HOST = os.getenv("DB_HOST")
-PORT = os.getenv("DB_PORT")
-DATABASE = os.getenv("DB_NAME")
-USER = os.getenv("DB_USER")
-PASSWORD = os.getenv("DB_PASSWORD")
-
-sql_lte = f'lte_{week_name}'
-sql_nr = f'nr_{week_name}'
-
-
-df_cell = load_cell_list(os.getenv(INPUT_FILE_PATH))
-site_ids = df_cell['site_name_1'].unique()
-where_clause, where_clause_1, where_clause_2 = generate_where_clause(site_ids)
-
-conn = connect_postgres(HOST, PORT, DATABASE, USER, PASSWORD)
-
-
-# Setup project paths
-output_dir = os.path.join(OUTPUT_BASE_DIR, folder_name)
-os.makedirs(output_dir, exist_ok=True)
-
-# Load and process input
-
-
-df_lte = fetch_data_lte(sql_lte, where_clause,conn)
-df_nr = fetch_data_nr(sql_nr,where_clause, conn)
-
-df_air_1 = fetch_data_air(where_clause_1, conn)
-df_air = df_air_1.pivot(index=['site', 'nodeid', 'sectorcarrierid'], columns='date', values='digitaltilt')
-df_air.reset_index(inplace=True)
-
-df_non_air_1 = fetch_data_non_air(where_clause_1, conn)
-df_non_air = df_non_air_1.pivot(index=['site', 'nodeid', 'userlabel','antennaunitgroupid','antennanearunitid','retsubunitid'
-                                    ,'antennamodelnumber','mintilt','maxtilt'], columns='date', values='electricalantennatilt')
-df_non_air.reset_index(inplace=True)
-
-
-df_hw_1 = fetch_data_hw(where_clause_2, conn)
-df_hw = df_hw_1.pivot(index=['site_name', 'name', 'device_name', 'device_no','subunit_no','max_tilt','min_tilt'], columns='date', values='actual_tilt')
-df_hw.reset_index(inplace=True)
-
-#LTE CELL Normalized
-df_lte_cell = lte_cell_normalized(df_lte)
-
-#ERIC_AIR Normalized
-df_eric_air = eric_air(df_air, sectorcarrierid_col='sectorcarrierid', nodeid_col='nodeid')
-#HWRET Normalized
-df_hwret = hwret(df_hw)
-df_hwret.rename(columns={'site_name': 'site'}, inplace=True)
-#ERIC_NON_AIR Normalized
-df_eric_non_air = eric_non_air(df_non_air)
-
-#ERIC_AIR MAP
-eric_air_map = pd.merge(
-    df_lte_cell,
-    df_eric_air,
-    on=['site', 'tuning_band', 'sector', 'carrier'],
-    how='inner'
-    )
-
-
-eric_air_map['Parameter MO'] = 'SectorCarrier=' + eric_air_map['sectorcarrierid']
-eric_air_map['Parameter Name'] = 'digitalTilt'
-eric_air_map.sort_values(['site_id', 'tuning_band','sector','carrier'])
-eric_air_map.drop_duplicates(inplace=True)
-
-#HWRET MAP
-hwret_map = pd.merge(
-    df_lte_cell,
-    df_hwret,
-    on=['site', 'tuning_band', 'sector'],
-    how='inner'
-)
-hwret_map.drop_duplicates(inplace=True)
-
-
-#ERIC_NON_AIR MAP
-eric_non_air_map = pd.merge(
-    df_lte_cell,
-    df_eric_non_air,
-    on=['site', 'tuning_band', 'sector'],
-    how='inner'
-)
-eric_non_air_map.drop_duplicates(inplace=True)
-
-columns_to_include= ['cell_name', 'site_id','system', 'sector_name','rat']
-df_MD_LTE_1 = df_lte[columns_to_include]
-df_MD_NR_1 = df_nr[columns_to_include]
-combined_df = pd.concat([df_MD_LTE_1, df_MD_NR_1], ignore_index=True)
-
-df_cell = df_cell.merge(combined_df, left_on='cell name', right_on='cell_name', how='left')
-
-
-
-
-
-
-df_lte['Tuning_Band'] = df_lte['system'].apply(tuning_band_logic)
-df_nr['Tuning_Band'] = df_nr['system'].apply(tuning_band_logic)
-df_cell['Tuning_Band'] = df_cell['system'].apply(tuning_band_logic)
-df_cell_LTE = df_cell[df_cell['rat'].isin(['LTE']) | pd.isna(df_cell['rat']) | ((df_cell['rat'] == 'NR') & (df_cell['system'] == 'NR2600'))]
-df_cell_NR = df_cell[df_cell['rat'] == 'NR']
-
-df_lte['seach']= df_lte['site_id']+ df_lte['Tuning_Band']+df_lte['sector_name']
-df_nr['seach']= df_nr['site_id']+ df_nr['system']+df_nr['sector_name']
-df_cell_LTE['seach']= df_cell_LTE['site_id']+ df_cell_LTE['Tuning_Band']+df_cell_LTE['sector_name']
-df_cell_NR['seach']= df_cell_NR['site_id']+ df_cell_NR['system']+df_cell_NR['sector_name']
-
-# Merge df_cell_LTE and df_lte on 'seach', and Cell Name
-merged_df_LTE = df_cell_LTE[['seach', 'cell name']].merge(
-    df_lte,
-    on='seach',
-    how='left',  # Use left join to retain all rows from df_cell_LTE
-    indicator=True  # Adds a column to show if the match was found
-)
-
-# Add a column to indicate if the value was found or not
-merged_df_LTE['status'] = merged_df_LTE['_merge'].apply(
-    lambda x: 'cannot find in database' if x == 'left_only' else 'found'
-)
-
-
-# Drop the '_merge' and 'seach' columns
-merged_df_LTE = merged_df_LTE.drop(columns=['_merge', 'seach'])
-
-# Reset the index
-merged_df_LTE = merged_df_LTE.reset_index(drop=True)
-
-# NR
-# Merge df_cell_NR and df_nr on 'seach', and Cell Name
-merged_df_NR = df_cell_NR[['seach', 'cell name']].merge(
-    df_nr,
-    on='seach',
-    how='left',  # Use left join to retain all rows from df_cell_NR
-    indicator=True  # Adds a column to show if the match was found
-)
-
-# Add a column to indicate if the value was found or not
-merged_df_NR['status'] = merged_df_NR['_merge'].apply(
-    lambda x: 'cannot find in database' if x == 'left_only' else 'found'
-)
-
-# Drop the '_merge' and 'seach' columns
-merged_df_NR = merged_df_NR.drop(columns=['_merge', 'seach'])
-
-# Reset the index
-merged_df_NR = merged_df_NR.reset_index(drop=True)
-
-
-
-# Apply the compacted function
-merged_df_LTE['suggestion'] = merged_df_LTE.apply(lambda row: suggestion(row['xtxr'],row['vendor'], row['antenna_type'], is_lte=True), axis=1)
-merged_df_NR['suggestion'] = merged_df_NR.apply(lambda row: suggestion(row['xtxr'],row['vendor'], row['antenna_type'], is_lte=False), axis=1)
-
-
-merged_df_LTE = merged_df_LTE.drop_duplicates()
-merged_df_NR = merged_df_NR.drop_duplicates()
-merged_df_LTE.rename(columns={'cell name': 'cell_name_remove'}, inplace=True)
-merged_df_NR.rename(columns={'cell name': 'cell_name_remove'}, inplace=True)
-
-
-df_hw_no_map = fetch_data_hw_no_map(where_clause_2, os.getenv("START_DATE"), os.getenv("END_DATE"), conn)
-df_hw_no_map.rename(columns={'antenna_type': 'file_type'}, inplace=True)
-df_hw_no_map['MO'] = 'RETSUBUNIT'
-df_hw_no_map['Parameter'] = 'Tilt'
-df_hw_no_map = df_hw_no_map.drop_duplicates()
-df_hw_no_map = df_hw_no_map.pivot(index=['file_type', 'site_name','name','device_name','device_no','subunit_no','MO','Parameter','max_tilt','min_tilt'], columns='date', values='actual_tilt')
-df_hw_no_map.reset_index(inplace=True)
-
-
-df_air_no_map = fetch_data_air_no_map(where_clause_1, os.getenv("START_DATE"), os.getenv("END_DATE"), conn)
-df_air_no_map.rename(columns={'antenna_type': 'file_type'}, inplace=True)
-df_air_no_map['MO'] = 'SectorCarrier=' + df_air_no_map['sectorcarrierid'].astype(str)
-df_air_no_map['Parameter'] = 'digitalTilt'
-df_air_no_map = df_air_no_map.pivot(index=['file_type', 'site_name','nodeid','sectorcarrierid','MO','Parameter'], columns='date', values='digitaltilt')
-df_air_no_map.reset_index(inplace=True)
-
-df_non_air_no_map = fetch_data_nonair_no_map(where_clause_1, os.getenv("START_DATE"), os.getenv("END_DATE"), conn)
-df_non_air_no_map.rename(columns={'antenna_type': 'file_type'}, inplace=True)
-# Columns to change to int
-change_to_int = [ 'antennanearunitid', 'retsubunitid']
-
-# Convert to numeric (float), then to integer
-df_non_air_no_map[change_to_int] = df_non_air_no_map[change_to_int].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
-df_non_air_no_map['MO'] = 'AntennaUnitGroup='+ df_non_air_no_map['normalizedantennaunitgroupid'].astype(str) +',AntennaNearUnit=' + df_non_air_no_map['antennanearunitid'].astype(str) +', RetSubUnit='+ df_non_air_no_map['retsubunitid'].astype(str)
-df_non_air_no_map['Parameter'] = 'electricalAntennaTilt'
-df_non_air_no_map = df_non_air_no_map.pivot(index=[ 'file_type', 'site_name','nodeid','normalizedantennaunitgroupid','antennanearunitid','retsubunitid'
-                             ,'userlabel','antennamodelnumber','mintilt','maxtilt','MO','Parameter'], columns='date', values='electricalantennatilt')
-df_non_air_no_map.reset_index(inplace=True)
-
-
-df_bfant_tilt = fetch_data_bfant_tilt(sql_lte,where_clause,os.getenv("START_DATE"), os.getenv("END_DATE"), conn)
-df_bfant_tilt = df_bfant_tilt.pivot(index=['cell_name', 'system', 'local_cell_id','bfant_name','device_no',
-                                           'connect_rru_subrack_no','local_cell_id_cellphy'], columns='date', values='tilt')
-df_bfant_tilt.reset_index(inplace=True)
-
-
-df_nr_tilt = fetch_data_nr_tilt(sql_nr,where_clause,os.getenv("START_DATE"), os.getenv("END_DATE"), conn)
-df_nr_tilt = df_nr_tilt.pivot(index=['nr_cell_name', 'system', 'nr_du_cell_id','nrducelltrpbeam_name','nr_du_cell_trp_id'
-                                           ], columns='date', values='tilt')
-df_nr_tilt.reset_index(inplace=True)
-
-df_split_tilt = fetch_data_split_tilt(sql_lte,where_clause,os.getenv("START_DATE"), os.getenv("END_DATE"), conn)
-df_split_tilt = df_split_tilt.pivot(index=['cell_name', 'system', 'local_cell_id','splitcell_name','splitcell_local_cell_id'
-                                           ], columns='date', values='cell_beam_tilt')
-df_split_tilt.reset_index(inplace=True)
-
-
-
-
-hwret_map.to_csv(os.path.join(output_dir, f'{cluster_name}_hwret_map.csv'), index=False)
-eric_air_map.to_csv(os.path.join(output_dir, f'{cluster_name}_eric_air_map.csv'), index=False)
-eric_non_air_map.to_csv(os.path.join(output_dir, f'{cluster_name}_eric_non_air_map.csv'), index=False)
-csv_files = [
-    f'{cluster_name}_hwret_map.csv',
-    f'{cluster_name}_eric_air_map.csv',
-    f'{cluster_name}_eric_non_air_map.csv'
-    ]
-zip_file_path = os.path.join(output_dir, f'{cluster_name}_files_map.zip')
-
-# Create the list of file paths
-file_paths = [os.path.join(output_dir, file) for file in csv_files]
-
-# Create the .zip archive
-with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-    for file in file_paths:
-        if os.path.exists(file):
-            zipf.write(file, os.path.basename(file))  # Add file to ZIP with its base name
-        else:
-            print(f"File {file} does not exist.")
-
-print(f"ZIP archive created at: {zip_file_path}")
-
-# Clean up (delete) the CSV files after zipping them
-for file in file_paths:
-    if os.path.exists(file):
-        os.remove(file)
-        print(f"Deleted: {file}")
-    else:
-        print(f"File {file} does not exist for deletion.")
-
-
-
-merged_df_LTE.to_csv(os.path.join(output_dir, f'Cell_LTE_result_{cluster_name}.csv'), index=False)
-merged_df_NR.to_csv(os.path.join(output_dir, f'Cell_NR_result_{cluster_name}.csv'), index=False)
-df_hw_no_map.to_csv(os.path.join(output_dir, f'{cluster_name}_hw.csv'), index=False)
-df_air_no_map.to_csv(os.path.join(output_dir, f'{cluster_name}_air.csv'), index=False)
-df_non_air_no_map.to_csv(os.path.join(output_dir, f'{cluster_name}_non_air.csv'), index=False)
-df_bfant_tilt.to_csv(os.path.join(output_dir, f'{cluster_name}_bfant_tilt.csv'), index=False)
-df_nr_tilt.to_csv(os.path.join(output_dir, f'{cluster_name}_nr_tilt.csv'), index=False)
-df_split_tilt.to_csv(os.path.join(output_dir, f'{cluster_name}_split_tilt.csv'), index=False)
-#df_RETSUBUNIT.to_csv(os.path.join(output_dir, f'{cluster_name}_RETSUBUNIT_map.csv'), index=False)
-# List of CSV files
-csv_files = [
-    f'Cell_LTE_result_{cluster_name}.csv',
-    f'Cell_NR_result_{cluster_name}.csv',
-    f'{cluster_name}_hw.csv',
-    f'{cluster_name}_air.csv',
-    f'{cluster_name}_non_air.csv',
-    f'{cluster_name}_bfant_tilt.csv',
-    f'{cluster_name}_nr_tilt.csv',
-    f'{cluster_name}_split_tilt.csv'
-]
-
-# Path for the zip file
-zip_file_path = os.path.join(output_dir, f'{cluster_name}_files_1.zip')
-
-# Create the list of file paths
-file_paths = [os.path.join(output_dir, file) for file in csv_files]
-
-# Create the .zip archive
-with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-    for file in file_paths:
-        if os.path.exists(file):
-            zipf.write(file, os.path.basename(file))  # Add file to ZIP with its base name
-        else:
-            print(f"File {file} does not exist.")
-
-
-
-
-print(f"ZIP archive created at: {zip_file_path}")
-
-# Clean up (delete) the CSV files after zipping them
-for file in file_paths:
-    if os.path.exists(file):
-        os.remove(file)
-        print(f"Deleted: {file}")
+# SERVER_SIDE_PIVOT=1 has PostgreSQL return the tilt history already pivoted by date
+SERVER_SIDE_PIVOT = os.getenv("SERVER_SIDE_PIVOT", "0") == "1"
+# BULK_COPY=1 transfers the tilt history through COPY ... TO STDOUT instead of read_sql
+BULK_COPY = os.getenv("BULK_COPY", "0") == "1"
+# Output archives: zlib level for the CSV entries, and ZIP_PARALLEL=1 writes both archives concurrently
+ZIP_COMPRESS_LEVEL = int(os.getenv("ZIP_COMPRESS_LEVEL", "6"))
+ZIP_PARALLEL = os.getenv("ZIP_PARALLEL", "0") == "1"
+# Worker threads for the independent branches of the per-cluster stage graph
+STAGE_WORKERS = int(os.getenv("STAGE_WORKERS", "4"))
+# SNAPSHOT_CACHE=1 serves lte_<WEEK> / nr_<WEEK> from local Parquet snapshots (scripts.snapshot_cache)
+SNAPSHOT_CACHE = os.getenv("SNAPSHOT_CACHE", "0") == "1"
+# HISTORY_CACHE=1 keeps the *_no_map daily history on disk and only fetches missing days (scripts.history_cache)
+HISTORY_CACHE = os.getenv("HISTORY_CACHE", "0") == "1"
+# The history cache stores long-format days, so the *_no_map outputs are then pivoted locally
+NO_MAP_WIDE = SERVER_SIDE_PIVOT and not HISTORY_CACHE
+# NORMALIZE_WORKERS=N runs the per-vendor normalizers in N worker processes (scripts.process_pool); 0 keeps them on the stage threads
+NORMALIZE_WORKERS = int(os.getenv("NORMALIZE_WORKERS", "0"))
+# SITE_BATCH_SIZE=N fetches and processes N sites at a time and spools each batch's outputs to disk (0 = all at once)
+SITE_BATCH_SIZE = int(os.getenv("SITE_BATCH_SIZE", "0"))
+# MEMORY_MODE=columnar keeps frames as pyarrow strings / shared categoricals between stages
+MEMORY_MODE = os.getenv("MEMORY_MODE", "").lower()
+# MEMORY_REPORT=1 logs each compact frame's memory next to its object-dtype estimate (columnar mode only)
+MEMORY_REPORT = os.getenv("MEMORY_REPORT", "0") == "1"
+
+# Site column each fetched frame is partitioned on in batch mode. The tilt frames carry no
+# site, so they follow the cell names of the cluster's LTE / NR rows instead (see partition_fetched).
+SITE_COLUMNS = {
+    'lte': 'site', 'nr': 'site', 'air': 'site', 'non_air': 'site', 'hw': 'site_name',
+    'hw_no_map': 'site_name', 'air_no_map': 'site_name', 'non_air_no_map': 'site_name',
+}
+
+
+def cluster_folder(cluster_name):
+    return cluster_name.split('_')[0]
+
+
+def input_file_path(cluster_name):
+    return f'{OUTPUT_BASE_DIR}{cluster_folder(cluster_name)}/Tuning_cell_list_{cluster_name}.csv'
+
+
+def fetch_all(site_ids, week_name, start_date, end_date, profile=None):
+    """Run the eleven fetch_data_* queries for ``site_ids``; returns ``{name: DataFrame}``."""
+    sql_lte = f'lte_{week_name}'
+    sql_nr = f'nr_{week_name}'
+    site_ids = list(site_ids)
+    # The eleven queries are independent, so run them concurrently over the pooled engine
+    return run_fetches({
+        'lte': (partial(snapshot_fetch, fetch_data_lte), (sql_lte, site_ids)) if SNAPSHOT_CACHE else (fetch_data_lte, (sql_lte, site_ids)),
+        'nr': (partial(snapshot_fetch, fetch_data_nr), (sql_nr, site_ids)) if SNAPSHOT_CACHE else (fetch_data_nr, (sql_nr, site_ids)),
+        'air': (fetch_data_air, (site_ids,)),
+        'non_air': (fetch_data_non_air, (site_ids,)),
+        'hw': (fetch_data_hw, (site_ids,)),
+        'hw_no_map': (partial(history_fetch, 'hw_no_map', partial(fetch_data_hwret_no_map, bulk=BULK_COPY),
+                              join_func=partial(join_hw_tilt_limits, bulk=BULK_COPY)),
+                      (site_ids, start_date, end_date))
+                     if HISTORY_CACHE else (partial(fetch_data_hw_no_map, wide=NO_MAP_WIDE, bulk=BULK_COPY), (site_ids, start_date, end_date)),
+        'air_no_map': (partial(history_fetch, 'air_no_map', partial(fetch_data_air_no_map, bulk=BULK_COPY)), (site_ids, start_date, end_date))
+                      if HISTORY_CACHE else (partial(fetch_data_air_no_map, wide=NO_MAP_WIDE, bulk=BULK_COPY), (site_ids, start_date, end_date)),
+        'non_air_no_map': (partial(history_fetch, 'non_air_no_map', partial(fetch_data_nonair_no_map, bulk=BULK_COPY)), (site_ids, start_date, end_date))
+                          if HISTORY_CACHE else (partial(fetch_data_nonair_no_map, wide=NO_MAP_WIDE, bulk=BULK_COPY), (site_ids, start_date, end_date)),
+        'bfant_tilt': (partial(fetch_data_bfant_tilt, wide=SERVER_SIDE_PIVOT, bulk=BULK_COPY), (sql_lte, site_ids, start_date, end_date)),
+        'nr_tilt': (partial(fetch_data_nr_tilt, wide=SERVER_SIDE_PIVOT, bulk=BULK_COPY), (sql_nr, site_ids, start_date, end_date)),
+        'split_tilt': (partial(fetch_data_split_tilt, wide=SERVER_SIDE_PIVOT, bulk=BULK_COPY), (sql_lte, site_ids, start_date, end_date)),
+    }, profile=profile)
+
+
+def partition_fetched(fetched, site_ids):
+    """Return the rows of every fetched frame that belong to ``site_ids``."""
+    part = {name: fetched[name][fetched[name][col].isin(site_ids)].reset_index(drop=True)
+            for name, col in SITE_COLUMNS.items()}
+    lte_cells = part['lte']['cell_name']
+    nr_cells = part['nr']['cell_name']
+    for name, col, cells in (('bfant_tilt', 'cell_name', lte_cells), ('split_tilt', 'cell_name', lte_cells),
+                             ('nr_tilt', 'nr_cell_name', nr_cells)):
+        part[name] = fetched[name][fetched[name][col].isin(cells)].reset_index(drop=True)
+    return part
+
+
+def normalize_lte(df_lte):
+    # lte_cell_normalized adds its columns in place; they also end up in Cell_LTE_result
+    return lte_cell_normalized(df_lte.copy())
+
+
+def normalize_eric_air(df_air_1):
+    df_air = df_air_1.pivot(index=['site', 'nodeid', 'sectorcarrierid'], columns='date', values='digitaltilt')
+    df_air.reset_index(inplace=True)
+    return eric_air(df_air, sectorcarrierid_col='sectorcarrierid', nodeid_col='nodeid')
+
+
+def normalize_eric_non_air(df_non_air_1):
+    df_non_air = df_non_air_1.pivot(index=['site', 'nodeid', 'userlabel','antennaunitgroupid','antennanearunitid','retsubunitid'
+                                        ,'antennamodelnumber','mintilt','maxtilt'], columns='date', values='electricalantennatilt')
+    df_non_air.reset_index(inplace=True)
+    return eric_non_air(df_non_air)
+
+
+def normalize_hwret(df_hw_1):
+    df_hw = df_hw_1.pivot(index=['site_name', 'name', 'device_name', 'device_no','subunit_no','max_tilt','min_tilt'], columns='date', values='actual_tilt')
+    df_hw.reset_index(inplace=True)
+    df_hwret = hwret(df_hw)
+    df_hwret.rename(columns={'site_name': 'site'}, inplace=True)
+    return df_hwret
+
+
+def map_eric_air(lte_index, df_eric_air):
+    eric_air_map = lte_index.join(df_eric_air, on=['site', 'tuning_band', 'sector', 'carrier'])
+    eric_air_map['Parameter MO'] = 'SectorCarrier=' + eric_air_map['sectorcarrierid']
+    eric_air_map['Parameter Name'] = 'digitalTilt'
+    return eric_air_map
+
+
+def map_hwret(lte_index, df_hwret):
+    return lte_index.join(df_hwret, on=['site', 'tuning_band', 'sector'])
+
+
+def map_eric_non_air(lte_index, df_eric_non_air):
+    return lte_index.join(df_eric_non_air, on=['site', 'tuning_band', 'sector'])
+
+
+def match_on_keys(df_cell, df_db, keys):
+    """Left-join tuning-list rows to database cells on the ``keys`` columns; adds 'status'.
+
+    Returns 'cell name', the columns of ``df_db`` (missing where nothing matched)
+    and 'status' ('found' / 'cannot find in database'). The key tuples are
+    joined as integer codes (see ret_utils.cell_index.tuple_codes).
+    """
+    cell_codes, db_codes = tuple_codes(df_cell[keys], df_db[keys])
+    merged = df_cell[['cell name']].merge(df_db, left_on=cell_codes, right_on=db_codes, how='left', indicator=True)
+    merged['status'] = np.where(merged['_merge'] == 'left_only', 'cannot find in database', 'found')
+    return merged.drop(columns=['key_0', '_merge']).reset_index(drop=True)
+
+
+def match_cells(df_cell, df_lte, df_nr):
+    """Match the tuning list against the LTE / NR cells; returns the Cell_LTE / Cell_NR results."""
+    df_lte = df_lte.copy()
+    # 'site' is only fetched so batch runs can partition NR cells by cluster
+    df_nr = df_nr.drop(columns='site')
+    columns_to_include= ['cell_name', 'site_id','system', 'sector_name','rat']
+    df_MD_LTE_1 = df_lte[columns_to_include]
+    df_MD_NR_1 = df_nr[columns_to_include]
+    combined_df = pd.concat([df_MD_LTE_1, df_MD_NR_1], ignore_index=True)
+
+    df_cell = df_cell.merge(combined_df, left_on='cell name', right_on='cell_name', how='left')
+
+    df_lte['Tuning_Band'] = system_band(df_lte['system'])
+    df_nr['Tuning_Band'] = system_band(df_nr['system'])
+    df_cell['Tuning_Band'] = system_band(df_cell['system'])
+    df_cell_LTE = df_cell[df_cell['rat'].isin(['LTE']) | pd.isna(df_cell['rat']) | ((df_cell['rat'] == 'NR') & (df_cell['system'] == 'NR2600'))]
+    df_cell_NR = df_cell[df_cell['rat'] == 'NR']
+
+    merged_df_LTE = match_on_keys(df_cell_LTE, df_lte, ['site_id', 'Tuning_Band', 'sector_name'])
+    merged_df_NR = match_on_keys(df_cell_NR, df_nr, ['site_id', 'system', 'sector_name'])
+
+    # Suggested tilt MO, from the rule table in ret_utils.io_helper
+    merged_df_LTE['suggestion'] = suggestion(merged_df_LTE['xtxr'], merged_df_LTE['vendor'], merged_df_LTE['antenna_type'], is_lte=True)
+    merged_df_NR['suggestion'] = suggestion(merged_df_NR['xtxr'], merged_df_NR['vendor'], merged_df_NR['antenna_type'], is_lte=False)
+
+    merged_df_LTE = merged_df_LTE.drop_duplicates()
+    merged_df_NR = merged_df_NR.drop_duplicates()
+    merged_df_LTE.rename(columns={'cell name': 'cell_name_remove'}, inplace=True)
+    merged_df_NR.rename(columns={'cell name': 'cell_name_remove'}, inplace=True)
+    return merged_df_LTE, merged_df_NR
+
+
+def history_hw(df_hw_no_map):
+    df_hw_no_map = df_hw_no_map.rename(columns={'antenna_type': 'file_type'})
+    df_hw_no_map['MO'] = 'RETSUBUNIT'
+    df_hw_no_map['Parameter'] = 'Tilt'
+    df_hw_no_map = df_hw_no_map.drop_duplicates()
+    return pivot_history(df_hw_no_map, ['file_type', 'site_name','name','device_name','device_no','subunit_no','MO','Parameter','max_tilt','min_tilt'],
+                                 'actual_tilt', wide=NO_MAP_WIDE)
+
+
+def history_air(df_air_no_map):
+    df_air_no_map = df_air_no_map.rename(columns={'antenna_type': 'file_type'})
+    df_air_no_map['MO'] = 'SectorCarrier=' + df_air_no_map['sectorcarrierid'].astype(str)
+    df_air_no_map['Parameter'] = 'digitalTilt'
+    return pivot_history(df_air_no_map, ['file_type', 'site_name','nodeid','sectorcarrierid','MO','Parameter'],
+                                  'digitaltilt', wide=NO_MAP_WIDE)
+
+
+def history_non_air(df_non_air_no_map):
+    df_non_air_no_map = df_non_air_no_map.rename(columns={'antenna_type': 'file_type'})
+    # Columns to change to int
+    change_to_int = [ 'antennanearunitid', 'retsubunitid']
+
+    # Convert to numeric (float), then to integer
+    df_non_air_no_map[change_to_int] = df_non_air_no_map[change_to_int].apply(pd.to_numeric, errors='coerce').fillna(0).astype(int)
+    df_non_air_no_map['MO'] = 'AntennaUnitGroup='+ df_non_air_no_map['normalizedantennaunitgroupid'].astype(str) +',AntennaNearUnit=' + df_non_air_no_map['antennanearunitid'].astype(str) +', RetSubUnit='+ df_non_air_no_map['retsubunitid'].astype(str)
+    df_non_air_no_map['Parameter'] = 'electricalAntennaTilt'
+    return pivot_history(df_non_air_no_map, [ 'file_type', 'site_name','nodeid','normalizedantennaunitgroupid','antennanearunitid','retsubunitid'
+                                 ,'userlabel','antennamodelnumber','mintilt','maxtilt','MO','Parameter'], 'electricalantennatilt', wide=NO_MAP_WIDE)
+
+
+def history_bfant(df_bfant_tilt):
+    return pivot_history(df_bfant_tilt, ['cell_name', 'system', 'local_cell_id','bfant_name','device_no',
+                                               'connect_rru_subrack_no','local_cell_id_cellphy'], 'tilt', wide=SERVER_SIDE_PIVOT)
+
+
+def history_nr_beam(df_nr_tilt):
+    return pivot_history(df_nr_tilt, ['nr_cell_name', 'system', 'nr_du_cell_id','nrducelltrpbeam_name','nr_du_cell_trp_id'
+                                               ], 'tilt', wide=SERVER_SIDE_PIVOT)
+
+
+def history_split_cell(df_split_tilt):
+    return pivot_history(df_split_tilt, ['cell_name', 'system', 'local_cell_id','splitcell_name','splitcell_local_cell_id'
+                                               ], 'cell_beam_tilt', wide=SERVER_SIDE_PIVOT)
+
+
+# The per-cluster pipeline: {stage: (func, inputs, outputs)}. Inputs name fetched frames
+# (see fetch_all), 'cell_list' or other stages' outputs. The Ericsson AIR, Ericsson non-AIR,
+# Huawei RET, BFANT, NR beam and split-cell branches share nothing and run concurrently.
+STAGES = {
+    'lte_cell': (normalize_lte, ('lte',), ('lte_cell',)),
+    'lte_index': (CellIndex, ('lte_cell',), ('lte_index',)),
+    'eric_air': (normalize_eric_air, ('air',), ('eric_air',)),
+    'eric_air_map': (map_eric_air, ('lte_index', 'eric_air'), ('eric_air_map',)),
+    'eric_non_air': (normalize_eric_non_air, ('non_air',), ('eric_non_air',)),
+    'eric_non_air_map': (map_eric_non_air, ('lte_index', 'eric_non_air'), ('eric_non_air_map',)),
+    'hwret': (normalize_hwret, ('hw',), ('hwret',)),
+    'hwret_map': (map_hwret, ('lte_index', 'hwret'), ('hwret_map',)),
+    'cell_match': (match_cells, ('cell_list', 'lte_cell', 'nr'), ('cell_lte_result', 'cell_nr_result')),
+    'hw_history': (history_hw, ('hw_no_map',), ('hw_history',)),
+    'air_history': (history_air, ('air_no_map',), ('air_history',)),
+    'non_air_history': (history_non_air, ('non_air_no_map',), ('non_air_history',)),
+    'bfant_history': (history_bfant, ('bfant_tilt',), ('bfant_history',)),
+    'nr_beam_history': (history_nr_beam, ('nr_tilt',), ('nr_beam_history',)),
+    'split_cell_history': (history_split_cell, ('split_tilt',), ('split_cell_history',)),
+}
+
+MAP_STAGES = ('lte_index', 'eric_air_map', 'hwret_map', 'eric_non_air_map')
+# Independent CPU-bound stages that NORMALIZE_WORKERS moves to worker processes
+NORMALIZE_STAGES = ('eric_air', 'eric_non_air', 'hwret')
+
+
+def build_outputs(df_cell, fetched, cluster_name, vocab=None, profile=None, pool=None):
+    """Run STAGES over one cluster's fetched frames; returns ``{zip_path: {csv_name: DataFrame}}``."""
+    stages = process_stages(STAGES, pool, NORMALIZE_STAGES) if pool else STAGES
+    # In columnar memory mode only the map merges work on the compact frames; see ret_utils.columnar
+    stages = columnar_stages(stages, vocab, compact_inputs=MAP_STAGES, report=MEMORY_REPORT) if vocab else stages
+    if profile:
+        stages = profile.wrap_stages(stages, cluster_name)
+    values, durations = run_stages(stages, {**fetched, 'cell_list': df_cell}, max_workers=STAGE_WORKERS)
+    logging.info("%s stage durations: %s", cluster_name,
+                 ", ".join(f"{name} {seconds:.2f}s" for name, seconds in durations.items()))
+
+    output_dir = os.path.join(OUTPUT_BASE_DIR, cluster_folder(cluster_name))
+    return {
+        os.path.join(output_dir, f'{cluster_name}_files_map.zip'): {
+            f'{cluster_name}_hwret_map.csv': values['hwret_map'],
+            f'{cluster_name}_eric_air_map.csv': values['eric_air_map'],
+            f'{cluster_name}_eric_non_air_map.csv': values['eric_non_air_map'],
+        },
+        os.path.join(output_dir, f'{cluster_name}_files_1.zip'): {
+            f'Cell_LTE_result_{cluster_name}.csv': values['cell_lte_result'],
+            f'Cell_NR_result_{cluster_name}.csv': values['cell_nr_result'],
+            f'{cluster_name}_hw.csv': values['hw_history'],
+            f'{cluster_name}_air.csv': values['air_history'],
+            f'{cluster_name}_non_air.csv': values['non_air_history'],
+            f'{cluster_name}_bfant_tilt.csv': values['bfant_history'],
+            f'{cluster_name}_nr_tilt.csv': values['nr_beam_history'],
+            f'{cluster_name}_split_tilt.csv': values['split_cell_history'],
+            #f'{cluster_name}_RETSUBUNIT_map.csv': df_RETSUBUNIT,
+        },
+    }
+
+
+def write_outputs(archives):
+    """Write ``{zip_path: {csv_name: DataFrame}}``, or every archive collected in a ``CsvSpool``."""
+    paths = archives.paths if isinstance(archives, CsvSpool) else archives
+    for output_dir in {os.path.dirname(path) for path in paths}:
+        os.makedirs(output_dir, exist_ok=True)
+    if isinstance(archives, CsvSpool):
+        written = archives.write(compresslevel=ZIP_COMPRESS_LEVEL, parallel=ZIP_PARALLEL)
     else:
-        print(f"File {file} does not exist for deletion.")
-
-
+        written = write_csv_archives(archives, compresslevel=ZIP_COMPRESS_LEVEL, parallel=ZIP_PARALLEL)
+    for zip_file_path in written:
+        print(f"ZIP archive created at: {zip_file_path}")
+
+
+def site_batches(site_ids, size):
+    """``site_ids`` in consecutive batches of ``size`` sites; one batch of all of them when ``size`` is 0."""
+    if size <= 0 or len(site_ids) <= size:
+        return [site_ids]
+    return [site_ids[start:start + size] for start in range(0, len(site_ids), size)]
+
+
+def _span(profile, kind, name, cluster=None):
+    """``profile.span(...)``, or a no-op yielding a throw-away record when not profiling."""
+    return profile.span(kind, name, cluster) if profile else nullcontext({})
+
+
+def run(cluster_names, week_name, start_date, end_date, profile=None):
+    """Generate the CR archives for every cluster from a single fetch over all their sites.
+
+    The queries run once for the union of the clusters' ``site_name_1`` values; each
+    cluster then gets its own slice of the results, so a week's batch costs one scan
+    of the lte/nr and RET tables instead of one per cluster.
+
+    With SITE_BATCH_SIZE that site list is split into batches that are fetched and
+    processed one after another. Every stage only groups or joins within a site, so
+    each batch's outputs are complete for its sites; they are spooled to disk and the
+    archives are written from the spool at the end, so memory follows the batch size.
+    """
+    with _span(profile, 'load', 'cell_lists') as record:
+        cells = {name: load_cell_list(input_file_path(name)) for name in cluster_names}
+        record['rows_out'] = sum(len(df_cell) for df_cell in cells.values())
+    cluster_sites = {name: df_cell['site_name_1'].unique() for name, df_cell in cells.items()}
+    site_ids = pd.unique(pd.Series([site for sites in cluster_sites.values() for site in sites], dtype=object))
+    batches = site_batches(site_ids, SITE_BATCH_SIZE)
+    logging.info("Fetching %d sites for %d cluster(s) in %d batch(es)", len(site_ids), len(cluster_names), len(batches))
+    vocab = Vocabulary() if MEMORY_MODE == 'columnar' else None
+    spool = CsvSpool() if len(batches) > 1 else None
+    # Started before the fetch so the workers have finished importing by the time the normalizers run
+    pool = StagePool(NORMALIZE_WORKERS) if NORMALIZE_WORKERS > 0 else None
+    try:
+        for number, batch in enumerate(batches, 1):
+            if spool:
+                logging.info("Site batch %d/%d: %d sites", number, len(batches), len(batch))
+            fetched = fetch_all(batch, week_name, start_date, end_date, profile)
+            if vocab:
+                fetched = {key: compact(df, vocab) for key, df in fetched.items()}
+                if MEMORY_REPORT:
+                    memory_report('fetch', fetched)
+
+            for name, df_cell in cells.items():
+                if spool:
+                    in_batch = df_cell['site_name_1'].isin(batch)
+                    if not in_batch.any():
+                        continue
+                    df_cell = df_cell[in_batch].reset_index(drop=True)
+                if len(cluster_names) == 1:
+                    part = fetched
+                else:
+                    with _span(profile, 'partition', 'fetched', name) as record:
+                        part = partition_fetched(fetched, cluster_sites[name])
+                        record['rows_out'] = sum(len(df) for df in part.values())
+                archives = build_outputs(df_cell, part, name, vocab, profile, pool)
+                with _span(profile, 'spool' if spool else 'write', 'archives', name) as record:
+                    if spool:
+                        spool.append(archives)
+                    else:
+                        write_outputs(archives)
+                    record['rows_in'] = sum(len(df) for frames in archives.values() for df in frames.values())
+            # Let go of this batch before the next one is fetched
+            fetched = part = archives = None
+        if spool:
+            with _span(profile, 'write', 'archives') as record:
+                write_outputs(spool)
+    finally:
+        if spool:
+            spool.close()
+        if pool:
+            pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate RET CR files for one or more clusters.")
+    parser.add_argument("--auto", action="store_true", help="latest lte_<WEEK> table and the last 14 days")
+    parser.add_argument("--start", default=os.getenv("START_DATE"), help="YYYY-MM-DD (default: START_DATE)")
+    parser.add_argument("--end", default=os.getenv("END_DATE"), help="YYYY-MM-DD (default: END_DATE)")
+    parser.add_argument("--week", help="week suffix of lte_/nr_ tables, e.g. WK2525 (default: WEEK_NUM)")
+    parser.add_argument("--cluster", nargs="+", help="one or more clusters (default: CLUSTER_NAME, comma separated)")
+    parser.add_argument("--profile", action="store_true",
+                        help="write a per-stage timing / rows / memory report next to process.log")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="with --profile, also dump cProfile stats of the slowest stage")
+    args = parser.parse_args()
+    cfg = build_cfg(args)
+    profile = RunProfile(cprofile=args.cprofile) if args.profile or args.cprofile else None
+    run(cfg["CLUSTER_NAMES"], cfg["WEEK_NUM"], cfg["START_DATE"], cfg["END_DATE"], profile)
+    if profile:
+        profile.write(LOG_DIR, cfg)
+
+
+if __name__ == "__main__":
+    main()
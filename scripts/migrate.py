@@ -0,0 +1,21 @@
+"""Apply the SQL files in migrations/ (in file-name order) to the configured database."""
+import logging
+from pathlib import Path
+
+import config  # noqa: F401  (loads .env and logging before db_utils reads the environment)
+import db_utils
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+
+
+def apply_migrations(migrations_dir: Path = MIGRATIONS_DIR):
+    """Run every ``*.sql`` file; statements are expected to be idempotent (IF NOT EXISTS)."""
+    engine = db_utils.get_engine()
+    for path in sorted(migrations_dir.glob("*.sql")):
+        logging.info("Applying migration %s", path.name)
+        with engine.begin() as conn:
+            conn.exec_driver_sql(path.read_text())
+
+
+if __name__ == "__main__":
+    apply_migrations()
@@ -0,0 +1,135 @@
+"""Run selected pipeline stages in worker processes (NORMALIZE_WORKERS).
+
+The per-vendor normalizers are pure pandas/regex work that holds the GIL, so
+on the stage-graph threads they take turns on one core. ``process_stages``
+wraps such stages so the calling thread ships the input frames to a process
+pool and waits for the result, and the other branches keep running.
+
+Frames cross the process boundary as Arrow IPC streams. Columns Arrow cannot
+give back exactly (mixed objects, Decimals, non-None missing values in string
+columns, ...) are pickled instead, together with the column labels and index,
+so the frame that comes back equals the one the stage built. Workers are
+started with 'spawn' (the only method on Windows) and import the stage
+function by module and name, so it must be a module-level function.
+"""
+import importlib
+import logging
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Object columns whose values Arrow stores and returns unchanged (with None as the only missing value)
+_ARROW_OBJECT_KINDS = {'string', 'date', 'empty'}
+_MASKED_DTYPES = {'Int8', 'Int16', 'Int32', 'Int64', 'UInt8', 'UInt16', 'UInt32', 'UInt64',
+                  'Float32', 'Float64', 'boolean'}
+
+
+def _arrow_exact(series: pd.Series) -> bool:
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype):
+        if dtype.kind in 'iufbM':
+            return True
+        if dtype != object:
+            return False
+        values = series.to_numpy()
+        missing = pd.isna(values)
+        return (pd.api.types.infer_dtype(values, skipna=True) in _ARROW_OBJECT_KINDS
+                and all(value is None for value in values[missing]))
+    return pd.api.types.is_extension_array_dtype(dtype) and dtype.name in _MASKED_DTYPES
+
+
+def encode_frame(df: pd.DataFrame) -> tuple:
+    """``(arrow_ipc_bytes, pickled_rest)`` for ``decode_frame``."""
+    arrow, pickled = {}, {}
+    for pos in range(df.shape[1]):
+        column = df.iloc[:, pos]
+        if _arrow_exact(column):
+            arrow[str(pos)] = column.reset_index(drop=True)
+        else:
+            pickled[pos] = column.array
+    table = pa.Table.from_pandas(pd.DataFrame(arrow), preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    rest = pickle.dumps({'columns': df.columns, 'index': df.index, 'pickled': pickled},
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    return sink.getvalue().to_pybytes(), rest
+
+
+def decode_frame(payload: tuple) -> pd.DataFrame:
+    ipc, rest = payload
+    rest = pickle.loads(rest)
+    arrow = pa.ipc.open_stream(ipc).read_all().to_pandas()
+    arrays = dict(rest['pickled'])
+    arrays.update((int(pos), arrow[pos].array) for pos in arrow.columns)
+    df = pd.DataFrame({pos: arrays[pos] for pos in range(len(rest['columns']))}, index=rest['index'])
+    return df.set_axis(rest['columns'], axis=1)
+
+
+def _encode_result(result):
+    if isinstance(result, tuple):
+        return tuple(encode_frame(df) for df in result)
+    return encode_frame(result)
+
+
+def _decode_result(payload):
+    if isinstance(payload[0], tuple):
+        return tuple(decode_frame(part) for part in payload)
+    return decode_frame(payload)
+
+
+def _call(module: str, qualname: str, payloads):
+    """Worker side: import the stage function, run it on the decoded frames, encode its result."""
+    func = importlib.import_module(module)
+    for attr in qualname.split('.'):
+        func = getattr(func, attr)
+    return _encode_result(func(*(decode_frame(p) for p in payloads)))
+
+
+def _warm_up():
+    """Started once per worker so the processes (and their pandas import) exist before the first stage."""
+    return multiprocessing.current_process().pid
+
+
+def _function_ref(func):
+    """(module, qualname) a worker can import ``func`` by; '__main__' is resolved to the module's real name."""
+    module = func.__module__
+    if module == '__main__':
+        spec = func.__globals__.get('__spec__')
+        if spec is None:
+            raise ValueError(f"{func.__qualname__} is defined in a script; run it with python -m to use worker processes")
+        module = spec.name
+    return module, func.__qualname__
+
+
+class StagePool:
+    """A process pool for stage functions that take and return DataFrames."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        for _ in range(workers):
+            self._executor.submit(_warm_up)
+        logging.info("Starting %d stage worker process(es)", workers)
+
+    def run(self, func, *frames):
+        """``func(*frames)`` in a worker process; blocks the calling thread until it returns."""
+        module, qualname = _function_ref(func)
+        payloads = [encode_frame(df) for df in frames]
+        return _decode_result(self._executor.submit(_call, module, qualname, payloads).result())
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+def process_stages(stages: dict, pool: StagePool, names) -> dict:
+    """Wrap ``{name: (func, inputs, outputs)}`` so the stages in ``names`` run in ``pool``."""
+    def wrap(func):
+        return lambda *args: pool.run(func, *args)
+
+    return {name: ((wrap(func) if name in names else func), inputs, outputs)
+            for name, (func, inputs, outputs) in stages.items()}
@@ -0,0 +1,245 @@
+"""Run report for ``--profile``: where the time and memory of a run went.
+
+Every fetch, pipeline stage and archive write is recorded as a span with its
+wall time, CPU time of the thread that ran it, rows in and out, and the peak
+process RSS seen while it ran (sampled with psutil when it is installed).
+
+For the fetches the DB-API cursor is wrapped to split each query into
+``execute_s`` and ``fetch_s``. read_sql uses a plain cursor, whose execute()
+returns once the whole result has arrived, so ``execute_s`` is server time plus
+transfer. iter_batches reads a server-side cursor, whose execute() only DECLAREs
+it; the query runs when rows are first FETCHed. There ``execute_s`` is the
+DECLARE plus the first FETCH (server time and the first DB_FETCH_ROWS chunk),
+and ``fetch_s`` is every later chunk. For COPY the split is at the first
+byte received, so ``fetch_s`` is the stream itself. ``bytes`` is exact for
+COPY and the text length of the fetched values for read_sql. ``frame_s`` is what
+is left of the wall time: building the DataFrame. Concurrent spans share the
+process, so their RSS peaks overlap.
+
+With ``cprofile=True`` each span also runs under cProfile, and the stats of the
+slowest one are dumped next to the report (open with ``python -m pstats``).
+"""
+import cProfile
+import io
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:  # RSS is then reported as null
+    psutil = None
+
+_RSS_INTERVAL = 0.02
+
+
+def _rows(values) -> int:
+    return sum(len(v) for v in values if isinstance(v, pd.DataFrame))
+
+
+def _text_bytes(rows) -> int:
+    return sum(map(len, map(str, itertools.chain.from_iterable(rows))))
+
+
+class _CountingWriter:
+    """File wrapper for copy_expert that counts bytes and notes when the first one arrived."""
+
+    def __init__(self, file, record):
+        self._file, self._record = file, record
+        self.first_write = None
+
+    def write(self, data):
+        if self.first_write is None:
+            self.first_write = time.perf_counter()
+        self._record['bytes'] += len(data.encode() if isinstance(data, str) else data)
+        return self._file.write(data)
+
+
+class _CountingTextWriter(_CountingWriter, io.TextIOBase):
+    """psycopg2 only hands decoded text to files that are io.TextIOBase instances."""
+
+
+class _ProfiledCursor:
+    def __init__(self, cursor, record):
+        self._cursor, self._record = cursor, record
+        self._declared = False
+
+    def execute(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            self._record['execute_s'] += time.perf_counter() - start
+            self._record['queries'] += 1
+            # A named cursor's execute() only DECLAREs it; the first FETCH runs the query
+            self._declared = getattr(self._cursor, 'name', None) is not None
+
+    def _fetch(self, method, *args):
+        start = time.perf_counter()
+        rows = getattr(self._cursor, method)(*args)
+        self._record['execute_s' if self._declared else 'fetch_s'] += time.perf_counter() - start
+        self._declared = False
+        self._record['bytes'] += _text_bytes([rows] if method == 'fetchone' and rows is not None else rows or ())
+        return rows
+
+    def fetchall(self):
+        return self._fetch('fetchall')
+
+    def fetchmany(self, *args):
+        return self._fetch('fetchmany', *args)
+
+    def fetchone(self):
+        return self._fetch('fetchone')
+
+    def _copy_expert(self, sql, file, *args):
+        writer = (_CountingTextWriter if isinstance(file, io.TextIOBase) else _CountingWriter)(file, self._record)
+        start = time.perf_counter()
+        try:
+            return self._cursor.copy_expert(sql, writer, *args)
+        finally:
+            end = time.perf_counter()
+            first = writer.first_write or end
+            self._record['execute_s'] += first - start
+            self._record['fetch_s'] += end - first
+            self._record['queries'] += 1
+
+    def __getattr__(self, name):
+        # copy_expert only exists when the real cursor has it; _read_history checks with hasattr
+        if name == 'copy_expert' and hasattr(self._cursor, 'copy_expert'):
+            return self._copy_expert
+        return getattr(self._cursor, name)
+
+
+class _ProfiledConnection:
+    def __init__(self, conn, record):
+        self._conn, self._record = conn, record
+
+    def cursor(self, *args, **kwargs):
+        return _ProfiledCursor(self._conn.cursor(*args, **kwargs), self._record)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class RunProfile:
+    """Collects the spans of one run; see the module docstring for what is recorded."""
+
+    def __init__(self, cprofile: bool = False):
+        self.cprofile = cprofile
+        self.spans = []
+        self._profiles = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._started = datetime.now()
+        self._wall, self._cpu = time.perf_counter(), time.process_time()
+        self._process = psutil.Process() if psutil else None
+        self._peak_rss = 0
+        self._stop = threading.Event()
+        if self._process:
+            threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True).start()
+        else:
+            logging.warning("psutil is not installed; the profile will not include RSS")
+
+    def _sample_rss(self):
+        while not self._stop.wait(_RSS_INTERVAL):
+            self._note_rss()
+
+    def _note_rss(self):
+        if not self._process:
+            return
+        rss = self._process.memory_info().rss
+        with self._lock:
+            self._peak_rss = max(self._peak_rss, rss)
+            for record in self._active.values():
+                record['peak_rss_mb'] = max(record['peak_rss_mb'], rss / 2**20)
+
+    @contextmanager
+    def span(self, kind, name, cluster=None, rows_in=None):
+        """Record the block as one span; yields its record so the caller can add rows_out etc."""
+        record = {'kind': kind, 'name': name, 'cluster': cluster, 'rows_in': rows_in, 'rows_out': None,
+                  'peak_rss_mb': 0.0 if self._process else None}
+        with self._lock:
+            self._active[id(record)] = record
+        self._note_rss()
+        profiler = None
+        if self.cprofile:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler already runs on this thread / interpreter
+                profiler = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_s'] = round(time.perf_counter() - wall, 4)
+            record['cpu_s'] = round(time.thread_time() - cpu, 4)
+            if profiler:
+                profiler.disable()
+            self._note_rss()
+            with self._lock:
+                del self._active[id(record)]
+                if profiler:
+                    self._profiles[len(self.spans)] = profiler
+                self.spans.append(record)
+
+    def fetch(self, name, func, args, conn):
+        """``func(*args, conn)`` as a 'fetch' span, with the connection's cursors timed."""
+        with self.span('fetch', name) as record:
+            record.update(queries=0, execute_s=0.0, fetch_s=0.0, bytes=0)
+            df = func(*args, _ProfiledConnection(conn, record))
+            record['rows_out'] = len(df)
+        record['frame_s'] = round(record['wall_s'] - record['execute_s'] - record['fetch_s'], 4)
+        record['execute_s'], record['fetch_s'] = round(record['execute_s'], 4), round(record['fetch_s'], 4)
+        return df
+
+    def wrap_stages(self, stages: dict, cluster=None) -> dict:
+        """Wrap ``{name: (func, inputs, outputs)}`` stages so each call is recorded as a 'stage' span."""
+        def wrap(name, func):
+            def run(*args):
+                with self.span('stage', name, cluster, rows_in=_rows(args)) as record:
+                    result = func(*args)
+                    record['rows_out'] = _rows(result if isinstance(result, tuple) else (result,))
+                return result
+            return run
+
+        return {name: (wrap(name, func), inputs, outputs) for name, (func, inputs, outputs) in stages.items()}
+
+    def write(self, log_dir, config=None):
+        """Write ``profile_<timestamp>.json`` (and the hottest span's ``.prof``) to ``log_dir``; returns the JSON path."""
+        self._stop.set()
+        stamp = self._started.strftime("%Y%m%d_%H%M%S")
+        report = {
+            'started': self._started.isoformat(timespec='seconds'),
+            'argv': sys.argv,
+            'config': config,
+            'wall_s': round(time.perf_counter() - self._wall, 4),
+            'cpu_s': round(time.process_time() - self._cpu, 4),
+            'peak_rss_mb': round(self._peak_rss / 2**20, 1) if self._process else None,
+            'spans': self.spans,
+        }
+        for record in self.spans:
+            if record['peak_rss_mb'] is not None:
+                record['peak_rss_mb'] = round(record['peak_rss_mb'], 1)
+        if self._profiles:
+            hottest = max(self._profiles, key=lambda i: self.spans[i]['wall_s'])
+            span = self.spans[hottest]
+            label = "_".join(str(part) for part in (span['cluster'], span['kind'], span['name']) if part)
+            prof_path = os.path.join(log_dir, f"profile_{stamp}_{label}.prof")
+            self._profiles[hottest].dump_stats(prof_path)
+            report['cprofile'] = {'span': hottest, 'path': prof_path}
+        path = os.path.join(log_dir, f"profile_{stamp}.json")
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1, default=str)
+        slowest = sorted(self.spans, key=lambda r: r['wall_s'], reverse=True)[:5]
+        logging.info("Profile written to %s; slowest: %s", path,
+                     ", ".join(f"{r['kind']} {r['name']} {r['wall_s']:.2f}s" for r in slowest))
+        return path
@@ -1,80 +1,96 @@
+import io
+import logging
+
 import pandas as pd
+import psycopg2
+
+import db_utils
+
+
+# ======== SITE FILTERS ========
+# The cluster's sites are bound as one text[] parameter, %(sites)s, instead of being spliced
+# into the SQL as an IN (...) list: a quote in a site name cannot break the query, the server
+# parses the whole list as a single array constant, and the SQL text no longer depends on the
+# cluster, so with DB_PREPARE=1 each query is planned once per session (see db_utils.read_sql).
+
+def _site_filter(column, site_ids):
+    """SQL condition limiting ``column`` to the bound sites; every site when ``site_ids`` is None."""
+    return "TRUE" if site_ids is None else f"{column} = ANY(%(sites)s::text[])"
+
+
+def _text_array(values):
+    """PostgreSQL array literal ('{"a","b"}') of ``values``, quoted for any content."""
+    quoted = (str(v).replace('\\', '\\\\').replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'"{v}"' for v in quoted) + "}"
+
+
+def _params(site_ids, start_date=None, end_date=None):
+    """Bound parameters of a fetch_data_* query."""
+    return {
+        'sites': None if site_ids is None else _text_array(site_ids),
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+
+
+# ======== JOIN KEYS ========
+# Joins compare their composite keys column by column. Names, device numbers and dates identify
+# a row and are treated as NOT NULL. The sub-identifiers (subunit_no, local_cell_id,
+# connect_rru_subrack_no, nr_du_cell_id) are nullable and joined with IS NOT DISTINCT FROM, so NULL
+# matches NULL as it did under the old CONCAT(...) = CONCAT(...) keys. PostgreSQL hashes or merges
+# on the = columns and applies IS NOT DISTINCT FROM as a join filter.
+
 
 # ======== COMMON SQL QUERIES ========
-def fetch_data_lte(sql_lte,where_clause, conn):
+def fetch_data_lte(sql_lte, site_ids, conn, chunk_rows=None):
     """Run a raw SQL query via an open psycopg2/SQLAlchemy connection."""
     query_lte = f"""
     SELECT site, site_id, cell_name, system, sector_name, antenna_type, vendor, mtilt, height, xtxr,local_cell_id,'LTE' as RAT
     FROM 
     {sql_lte} a
     WHERE
-    {where_clause} 
+    {_site_filter('site', site_ids)} 
 
     """
-    return pd.read_sql_query(query_lte, conn)
+    if chunk_rows:  # stream pyarrow batches instead (see db_utils.iter_batches)
+        return db_utils.iter_batches(query_lte, conn, chunk_rows, params=_params(site_ids))
+    return db_utils.read_sql(query_lte, conn, params=_params(site_ids))
 
 
-def fetch_data_nr(sql_nr,where_clause, conn):
+def fetch_data_nr(sql_nr, site_ids, conn, chunk_rows=None):
     query_nr = f"""
-    SELECT vendor, site_id, gnodeb_name, sector_name,nr_cell_name as cell_name,nr_du_cell_id as local_cell_id,system,xtxr,ant_type as antenna_type,
+    SELECT site, vendor, site_id, gnodeb_name, sector_name,nr_cell_name as cell_name,nr_du_cell_id as local_cell_id,system,xtxr,ant_type as antenna_type,
     'NR' as RAT
     FROM {sql_nr} a
-    WHERE {where_clause}
+    WHERE {_site_filter('site', site_ids)}
     """
-    return pd.read_sql_query(query_nr, conn)
+    if chunk_rows:  # stream pyarrow batches instead (see db_utils.iter_batches)
+        return db_utils.iter_batches(query_nr, conn, chunk_rows, params=_params(site_ids))
+    return db_utils.read_sql(query_nr, conn, params=_params(site_ids))
 
 # ======== MAPPED SQL QUERIES ========
 
-def fetch_data_air(where_clause_1, conn):
+def fetch_data_air(site_ids, conn):
+    # Latest row per device; the site filter runs before DISTINCT ON so only the
+    # cluster's devices are sorted (served by the left(nodeid, 7) expression index)
     query_air = f"""
-    WITH RankedData AS (
-        SELECT 
-            LEFT(nodeid, 7) AS site, 
-            nodeid, 
-            sectorcarrierid, 
-            date, 
-            digitaltilt,
-            ROW_NUMBER() OVER (
-                PARTITION BY nodeid, sectorcarrierid
-                ORDER BY date DESC
-            ) AS RowNum
-        FROM eric_air_data
-    )
-    SELECT 
-        site, 
+    SELECT DISTINCT ON (nodeid, sectorcarrierid)
+        LEFT(nodeid, 7) AS site, 
         nodeid, 
         sectorcarrierid, 
         date, 
         digitaltilt
-    FROM RankedData 
-    WHERE {where_clause_1} and RowNum = 1;
+    FROM eric_air_data
+    WHERE {_site_filter('left(nodeid, 7)', site_ids)}
+    ORDER BY nodeid, sectorcarrierid, date DESC;
 
     """
-    return pd.read_sql_query(query_air, conn)
+    return db_utils.read_sql(query_air, conn, params=_params(site_ids))
 
-def fetch_data_non_air(where_clause_1, conn):
+def fetch_data_non_air(site_ids, conn):
     query_non_air = f"""
-    WITH RankedData AS (
-        SELECT 
-            LEFT(nodeid, 7) AS site, 
-            nodeid, 
-            userlabel,
-            antennaunitgroupid,
-            antennanearunitid,
-            retsubunitid,
-            antennamodelnumber,
-            maxtilt,
-            mintilt,
-            date,
-            electricalAntennaTilt,
-            ROW_NUMBER() OVER (
-                PARTITION BY nodeid, userlabel, antennaunitgroupid, antennanearunitid, retsubunitid, antennamodelnumber, maxtilt, mintilt
-                ORDER BY date DESC
-            ) AS RowNum
-        FROM eric_non_air_data
-    )
-    SELECT 
-        site, 
+    SELECT DISTINCT ON (nodeid, userlabel, antennaunitgroupid, antennanearunitid, retsubunitid, antennamodelnumber, maxtilt, mintilt)
+        LEFT(nodeid, 7) AS site, 
         nodeid, 
         userlabel,
         antennaunitgroupid,
@@ -85,30 +101,28 @@ def fetch_data_non_air(where_clause_1, conn):
         mintilt,
         date,
         electricalAntennaTilt
-    FROM RankedData
-    WHERE {where_clause_1} and RowNum = 1;
+    FROM eric_non_air_data
+    WHERE {_site_filter('left(nodeid, 7)', site_ids)}
+    ORDER BY nodeid, userlabel, antennaunitgroupid, antennanearunitid, retsubunitid, antennamodelnumber, maxtilt, mintilt, date DESC;
     """
-    return pd.read_sql_query(query_non_air, conn)
+    return db_utils.read_sql(query_non_air, conn, params=_params(site_ids))
 
 
 
-def fetch_data_hw(where_clause_2, conn):
+def fetch_data_hw(site_ids, conn):
     query_hw = f"""
-    WITH RankedData AS (
-        SELECT
+    WITH LatestData AS (
+        SELECT DISTINCT ON (name, device_name, device_no, subunit_no)
             site_name,
             name,
             device_name,
             device_no,
             subunit_no,
             date,
-            Actual_tilt,
-            ROW_NUMBER() OVER (
-                PARTITION BY name, device_name, device_no,subunit_no
-                ORDER BY date DESC
-            ) AS RowNum
+            Actual_tilt
         FROM hwret_data
-        WHERE {where_clause_2}
+        WHERE {_site_filter('site_name', site_ids)}
+        ORDER BY name, device_name, device_no, subunit_no, date DESC
     )
     SELECT
         site_name,
@@ -120,17 +134,147 @@ def fetch_data_hw(where_clause_2, conn):
         c.min_tilt,
         a.date,
         Actual_tilt
-    FROM RankedData a
+    FROM LatestData a
     LEFT JOIN
-    retdevicedata_1 c ON concat(a.date,a.NAME,a.Device_Name,a.Device_No,a.subunit_no) = concat(c.date,c.NAME,c.Device_Name,c.Device_No,c.subunit_no)
-    WHERE {where_clause_2} and RowNum = 1;
+    retdevicedata_1 c
+        ON  c.NAME = a.NAME
+        AND c.Device_Name = a.Device_Name
+        AND c.Device_No = a.Device_No
+        AND c.subunit_no IS NOT DISTINCT FROM a.subunit_no
+        AND c.date = a.date;
 
     """
-    return pd.read_sql_query(query_hw, conn)
+    return db_utils.read_sql(query_hw, conn, params=_params(site_ids))
 
 # ======== NO MAPPED SQL QUERIES ========
 
-def fetch_data_hw_no_map(where_clause_2, start_date, end_date, conn):
+# Device columns of each history query; the wide form has one row per distinct combination
+HW_NO_MAP_KEYS = ['antenna_type', 'site_name', 'name', 'device_name', 'device_no', 'subunit_no', 'max_tilt', 'min_tilt']
+AIR_NO_MAP_KEYS = ['antenna_type', 'site_name', 'nodeid', 'sectorcarrierid']
+NON_AIR_NO_MAP_KEYS = ['antenna_type', 'site_name', 'nodeid', 'normalizedantennaunitgroupid', 'antennanearunitid',
+                       'retsubunitid', 'userlabel', 'antennamodelnumber', 'mintilt', 'maxtilt']
+BFANT_TILT_KEYS = ['cell_name', 'system', 'local_cell_id', 'bfant_name', 'device_no', 'connect_rru_subrack_no',
+                   'local_cell_id_cellphy']
+NR_TILT_KEYS = ['nr_cell_name', 'system', 'nr_du_cell_id', 'nrducelltrpbeam_name', 'nr_du_cell_trp_id']
+SPLIT_TILT_KEYS = ['cell_name', 'system', 'local_cell_id', 'splitcell_name', 'splitcell_local_cell_id']
+
+# Columns the bulk COPY path must keep as text; everything else goes through the C parser's numeric inference,
+# as read_sql would give. Dates are read as text and turned into datetime.date objects (see _as_dates).
+HW_NO_MAP_TEXT = ['antenna_type', 'site_name', 'name', 'device_name', 'date']
+AIR_NO_MAP_TEXT = ['antenna_type', 'site_name', 'nodeid', 'sectorcarrierid', 'date']
+NON_AIR_NO_MAP_TEXT = ['antenna_type', 'site_name', 'nodeid', 'normalizedantennaunitgroupid', 'antennanearunitid',
+                       'retsubunitid', 'userlabel', 'antennamodelnumber', 'date']
+BFANT_TILT_TEXT = ['cell_name', 'system', 'bfant_name', 'date']
+NR_TILT_TEXT = ['nr_cell_name', 'system', 'nrducelltrpbeam_name', 'date']
+SPLIT_TILT_TEXT = ['cell_name', 'system', 'splitcell_name', 'date']
+
+
+def _wide_by_date(query, index_cols, value_col, start_date, end_date):
+    """Wrap a long history query (one row per device per day) so PostgreSQL returns
+    one row per device and one column per date from start_date to end_date."""
+    index = ", ".join(index_cols)
+    per_date = ",\n        ".join(
+        f"MAX(h.{value_col}) FILTER (WHERE h.date::date = DATE '{day}') AS \"{day}\""
+        for day in pd.date_range(start_date, end_date).strftime("%Y-%m-%d")
+    )
+    return f"""
+    SELECT {index},
+        {per_date}
+    FROM ({query}) h
+    GROUP BY {index}
+    ORDER BY {index}
+    """
+
+
+def _as_dates(values):
+    """'YYYY-MM-DD' strings as the datetime.date objects read_sql returns for a date column."""
+    uniques = values.dropna().unique()
+    return values.map(dict(zip(uniques, pd.to_datetime(uniques).date)))
+
+
+def _read_history(query, conn, text_cols, bulk=False, params=None):
+    """Run a history query, through COPY ... TO STDOUT when `bulk` is set.
+
+    COPY ships the result as one CSV stream that pandas' C reader parses in bulk,
+    instead of read_sql building a Python tuple per row. NULL is sent as \\N so it
+    stays distinct from an empty string. Connections without copy_expert (anything
+    but a raw psycopg2 connection) use read_sql, and so does a COPY that fails for
+    any database reason (after a rollback).
+    COPY takes no bind parameters, so `params` are interpolated client-side with
+    the driver's quoting (mogrify) first. The statement stays in the bytes mogrify
+    returns: the server's encoding name (WIN1252, SQL_ASCII, ...) need not be a
+    Python codec.
+    """
+    if bulk and hasattr(conn, 'cursor'):
+        cursor = conn.cursor()
+        if hasattr(cursor, 'copy_expert'):
+            buf = io.StringIO()
+            try:
+                bound = cursor.mogrify(query, params or None)
+                cursor.copy_expert(b"COPY (" + bound + b") TO STDOUT WITH (FORMAT csv, HEADER, NULL '\\N')", buf)
+            except psycopg2.Error as exc:
+                conn.rollback()
+                logging.warning("COPY failed (%s); falling back to read_sql", exc)
+            else:
+                buf.seek(0)
+                frame = pd.read_csv(buf, dtype=dict.fromkeys(text_cols, str), na_values=['\\N'], keep_default_na=False)
+                if 'date' in frame.columns:
+                    frame['date'] = _as_dates(frame['date'])
+                return frame
+            finally:
+                cursor.close()
+    return db_utils.read_sql(query, conn, params=params)
+
+
+def fetch_data_hwret_no_map(site_ids, start_date, end_date, conn, bulk=False):
+    """The hwret_data side of fetch_data_hw_no_map, without max_tilt / min_tilt.
+
+    This is what the history cache stores; join_hw_tilt_limits adds the tilt
+    limits from retdevicedata_1 after the cached and fetched days are merged.
+    """
+    query = f"""
+    SELECT
+        'huawei' AS antenna_type,
+        site_name,
+        a.NAME,
+        a.Device_Name,
+        a.Device_No,
+        a.subunit_no,
+        a.date,
+        Actual_tilt
+    FROM hwret_data a
+    WHERE a.date BETWEEN %(start_date)s AND %(end_date)s
+      AND {_site_filter('site_name', site_ids)}
+    GROUP BY antenna_type, site_name, a.NAME, a.Device_Name, a.Device_No, a.subunit_no, a.date, Actual_tilt
+    """
+    return _read_history(query, conn, HW_NO_MAP_TEXT, bulk, _params(site_ids, start_date, end_date))
+
+
+def join_hw_tilt_limits(rows, conn, bulk=False):
+    """Add max_tilt / min_tilt from retdevicedata_1 to fetch_data_hwret_no_map rows.
+
+    Gives the rows fetch_data_hw_no_map returns: one per distinct tilt pair of
+    the device, or one with empty limits when the device has none. Only the
+    devices named in ``rows`` are read.
+    """
+    keys = ['name', 'device_name', 'device_no', 'subunit_no']
+    if 'max_tilt' in rows.columns:
+        # Written by an older version that cached the joined rows
+        rows = rows.drop(columns=['max_tilt', 'min_tilt']).drop_duplicates()
+    query = """
+    SELECT DISTINCT name, device_name, device_no, subunit_no, max_tilt, min_tilt
+    FROM retdevicedata_1
+    WHERE name = ANY(%(names)s::text[])
+    """
+    names = rows['name'].dropna().unique()
+    limits = _read_history(query, conn, ['name', 'device_name'], bulk, {'names': _text_array(names)})
+    # As in SQL (see JOIN KEYS), NULL names and device numbers never match; a NULL subunit_no matches NULL
+    limits = limits.dropna(subset=keys[:3])
+    joined = rows.merge(limits, on=keys, how='left')
+    return joined[['antenna_type', 'site_name', *keys, 'max_tilt', 'min_tilt', 'date', 'actual_tilt']]
+
+
+def fetch_data_hw_no_map(site_ids, start_date, end_date, conn, wide=False, bulk=False):
     query_hw_no_map = f"""
     SELECT  
         'huawei' AS antenna_type, 
@@ -145,11 +289,15 @@ def fetch_data_hw_no_map(where_clause_2, start_date, end_date, conn):
         Actual_tilt
     FROM hwret_data a
     LEFT JOIN
-        retdevicedata_1 c ON concat(a.NAME, a.Device_Name, a.Device_No, a.subunit_no) = concat(c.NAME, c.Device_Name, c.Device_No, c.subunit_no)
+        retdevicedata_1 c
+            ON  c.NAME = a.NAME
+            AND c.Device_Name = a.Device_Name
+            AND c.Device_No = a.Device_No
+            AND c.subunit_no IS NOT DISTINCT FROM a.subunit_no
 
-    WHERE a.date BETWEEN '{start_date}' AND '{end_date}'
+    WHERE a.date BETWEEN %(start_date)s AND %(end_date)s
 
-      AND {where_clause_2}
+      AND {_site_filter('site_name', site_ids)}
     GROUP BY 
          
         antenna_type, 
@@ -163,9 +311,11 @@ def fetch_data_hw_no_map(where_clause_2, start_date, end_date, conn):
         c.min_tilt,
         Actual_tilt
     """
-    return pd.read_sql_query(query_hw_no_map, conn)
+    if wide:
+        query_hw_no_map = _wide_by_date(query_hw_no_map, HW_NO_MAP_KEYS, 'actual_tilt', start_date, end_date)
+    return _read_history(query_hw_no_map, conn, HW_NO_MAP_TEXT, bulk, _params(site_ids, start_date, end_date))
 
-def fetch_data_air_no_map(where_clause_1, start_date, end_date, conn):
+def fetch_data_air_no_map(site_ids, start_date, end_date, conn, wide=False, bulk=False):
     query_air_no_map = f"""
     SELECT 
         
@@ -180,7 +330,7 @@ def fetch_data_air_no_map(where_clause_1, start_date, end_date, conn):
         eric_air_data a
 
 
-    WHERE a.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause_1}
+    WHERE a.date BETWEEN %(start_date)s AND %(end_date)s AND {_site_filter('left(nodeid, 7)', site_ids)}
 
     GROUP BY 
         
@@ -191,11 +341,13 @@ def fetch_data_air_no_map(where_clause_1, start_date, end_date, conn):
         date,
         digitalTilt
     """
-    return pd.read_sql_query(query_air_no_map, conn)
+    if wide:
+        query_air_no_map = _wide_by_date(query_air_no_map, AIR_NO_MAP_KEYS, 'digitaltilt', start_date, end_date)
+    return _read_history(query_air_no_map, conn, AIR_NO_MAP_TEXT, bulk, _params(site_ids, start_date, end_date))
 
 
 
-def fetch_data_nonair_no_map(where_clause_1, start_date, end_date, conn):
+def fetch_data_nonair_no_map(site_ids, start_date, end_date, conn, wide=False, bulk=False):
     query_non_air_no_map = f"""
     SELECT 
         
@@ -224,7 +376,7 @@ def fetch_data_nonair_no_map(where_clause_1, start_date, end_date, conn):
 
     FROM
         eric_non_air_data a
-    WHERE a.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause_1}
+    WHERE a.date BETWEEN %(start_date)s AND %(end_date)s AND {_site_filter('left(nodeid, 7)', site_ids)}
 
     GROUP BY 
         
@@ -253,10 +405,12 @@ def fetch_data_nonair_no_map(where_clause_1, start_date, end_date, conn):
         electricalAntennaTilt
     """
 
-    return pd.read_sql_query(query_non_air_no_map, conn)
+    if wide:
+        query_non_air_no_map = _wide_by_date(query_non_air_no_map, NON_AIR_NO_MAP_KEYS, 'electricalantennatilt', start_date, end_date)
+    return _read_history(query_non_air_no_map, conn, NON_AIR_NO_MAP_TEXT, bulk, _params(site_ids, start_date, end_date))
 
 
-def fetch_data_bfant_tilt(sql_lte, where_clause, start_date, end_date, conn):
+def fetch_data_bfant_tilt(sql_lte, site_ids, start_date, end_date, conn, wide=False, bulk=False):
     query_bfant_tilt = f"""
     SELECT 
         a.cell_name,
@@ -270,18 +424,22 @@ def fetch_data_bfant_tilt(sql_lte, where_clause, start_date, end_date, conn):
         b.tilt
     FROM {sql_lte} a 
     LEFT JOIN cellphytopo c 
-        ON CONCAT(a.enodeb_name, a.local_cell_id) = CONCAT(c.name, c.local_cell_id)
+        ON  c.name = a.enodeb_name
+        AND c.local_cell_id IS NOT DISTINCT FROM a.local_cell_id
     LEFT JOIN bfant b 
-        ON CONCAT(b.name, b.connect_rru_subrack_no) = CONCAT(c.name, split_part(c.rf_module_information, '-', 2))
+        ON  b.name = c.name
+        AND b.connect_rru_subrack_no::text IS NOT DISTINCT FROM split_part(c.rf_module_information, '-', 2)
 
-    WHERE b.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause}
+    WHERE b.date BETWEEN %(start_date)s AND %(end_date)s AND {_site_filter('site', site_ids)}
 
     GROUP BY a.cell_name,a.system, a.local_cell_id, b.name,b.device_no, b.connect_rru_subrack_no, c.local_cell_id,b.date, b.tilt
     """
-    return pd.read_sql_query(query_bfant_tilt, conn)
+    if wide:
+        query_bfant_tilt = _wide_by_date(query_bfant_tilt, BFANT_TILT_KEYS, 'tilt', start_date, end_date)
+    return _read_history(query_bfant_tilt, conn, BFANT_TILT_TEXT, bulk, _params(site_ids, start_date, end_date))
 
 
-def fetch_data_nr_tilt(sql_nr, where_clause, start_date, end_date, conn):
+def fetch_data_nr_tilt(sql_nr, site_ids, start_date, end_date, conn, wide=False, bulk=False):
     query_nr_tilt = f"""
     SELECT
         a.nr_cell_name,
@@ -292,15 +450,18 @@ def fetch_data_nr_tilt(sql_nr, where_clause, start_date, end_date, conn):
         b.date, b.tilt
     FROM {sql_nr} a 
     JOIN NRDUCELLTRPBEAM b
-        ON CONCAT(a.gnodeb_name, a.nr_du_cell_id) = CONCAT(b.name, b.nr_du_cell_trp_id)
+        ON  b.name = a.gnodeb_name
+        AND b.nr_du_cell_trp_id IS NOT DISTINCT FROM a.nr_du_cell_id
 
-    WHERE b.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause}
+    WHERE b.date BETWEEN %(start_date)s AND %(end_date)s AND {_site_filter('site', site_ids)}
 
     GROUP BY a.nr_cell_name,a.system, a.nr_du_cell_id, b.name,b.nr_du_cell_trp_id,b.date, b.tilt
     """
-    return pd.read_sql_query(query_nr_tilt, conn)
+    if wide:
+        query_nr_tilt = _wide_by_date(query_nr_tilt, NR_TILT_KEYS, 'tilt', start_date, end_date)
+    return _read_history(query_nr_tilt, conn, NR_TILT_TEXT, bulk, _params(site_ids, start_date, end_date))
 
-def fetch_data_split_tilt(sql_lte, where_clause, start_date, end_date, conn):
+def fetch_data_split_tilt(sql_lte, site_ids, start_date, end_date, conn, wide=False, bulk=False):
     query_split_tilt = f"""
     SELECT
         a.cell_name,
@@ -311,11 +472,14 @@ def fetch_data_split_tilt(sql_lte, where_clause, start_date, end_date, conn):
         b.date, cell_beam_tilt
     FROM {sql_lte} a 
     JOIN SECTORSPLITCELL b
-        ON CONCAT(a.enodeb_name, a.local_cell_id) = CONCAT(b.name, b.local_cell_id)
+        ON  b.name = a.enodeb_name
+        AND b.local_cell_id IS NOT DISTINCT FROM a.local_cell_id
 
-    WHERE b.date BETWEEN '{start_date}' AND '{end_date}' AND {where_clause}
+    WHERE b.date BETWEEN %(start_date)s AND %(end_date)s AND {_site_filter('site', site_ids)}
     GROUP BY a.cell_name,a.system, a.local_cell_id, b.name,b.local_cell_id,b.date, cell_beam_tilt
     """
-    return pd.read_sql_query(query_split_tilt, conn)
+    if wide:
+        query_split_tilt = _wide_by_date(query_split_tilt, SPLIT_TILT_KEYS, 'cell_beam_tilt', start_date, end_date)
+    return _read_history(query_split_tilt, conn, SPLIT_TILT_TEXT, bulk, _params(site_ids, start_date, end_date))
 
 
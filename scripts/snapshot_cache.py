@@ -0,0 +1,115 @@
+"""On-disk Parquet snapshots of the immutable weekly lte_<WEEK> / nr_<WEEK> tables.
+
+The first run of a week stores the whole projection of a weekly fetch (no site
+filter) as ``<table>-<fetch>-<hash>.parquet``, streamed from a server-side cursor
+one DB_FETCH_ROWS chunk (and row group) at a time; later runs read only their
+sites back from it. The hash covers the fetch function's code and SQL text, so editing
+its SELECT starts a new snapshot instead of serving stale columns. Least recently
+used snapshots are evicted once the directory passes SNAPSHOT_CACHE_MAX_MB; the
+week being fetched is never evicted by its own run.
+
+    python -m scripts.snapshot_cache list
+    python -m scripts.snapshot_cache invalidate --week WK2525   # or --all
+"""
+import argparse
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import db_utils
+
+CACHE_DIR = Path(os.getenv("SNAPSHOT_CACHE_DIR", Path(__file__).resolve().parents[1] / "cache" / "snapshots"))
+MAX_BYTES = int(float(os.getenv("SNAPSHOT_CACHE_MAX_MB", "2048")) * 2**20)
+
+
+def snapshot_path(table, fetch_func, cache_dir: Path = CACHE_DIR) -> Path:
+    code = fetch_func.__code__
+    digest = hashlib.sha1(code.co_code + repr(code.co_consts).encode()).hexdigest()[:10]
+    return cache_dir / f"{table}-{fetch_func.__name__}-{digest}.parquet"
+
+
+def evict(cache_dir: Path = CACHE_DIR, max_bytes: int = MAX_BYTES, keep=()):
+    """Delete least recently used snapshots until the cache fits in ``max_bytes``."""
+    files = sorted(cache_dir.glob("*.parquet"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    for path in files:
+        if total <= max_bytes:
+            break
+        if path in keep:
+            continue
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
+        logging.info("Evicted snapshot %s", path.name)
+
+
+def snapshot_fetch(fetch_func, table, site_ids, conn, cache_dir: Path = CACHE_DIR):
+    """``fetch_func(table, site_ids, conn)``, served from the week's snapshot.
+
+    ``fetch_func`` must return the whole table for ``site_ids=None`` and yield pyarrow
+    batches when given ``chunk_rows`` (as ``fetch_data_lte`` / ``fetch_data_nr`` do),
+    and its result must have a ``site`` column, which is what the snapshot is filtered on.
+    """
+    path = snapshot_path(table, fetch_func, cache_dir)
+    if not path.exists():
+        start = time.perf_counter()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        rows, writer = 0, None
+        try:
+            for batch in fetch_func(table, None, conn, chunk_rows=db_utils.DB_FETCH_ROWS):
+                writer = writer or pq.ParquetWriter(tmp, batch.schema)
+                writer.write_batch(batch)
+                rows += batch.num_rows
+        finally:
+            if writer:
+                writer.close()
+        os.replace(tmp, path)
+        logging.info("Snapshot %s: %d rows, %.1f MB in %.2fs",
+                     path.name, rows, path.stat().st_size / 2**20, time.perf_counter() - start)
+        # Every snapshot of this week is kept: lte and nr are fetched concurrently, and one
+        # must not evict the other's snapshot before it has been read
+        week = table.split('_', 1)[-1]
+        evict(cache_dir, keep=set(cache_dir.glob(f"*_{week}-*.parquet")))
+    else:
+        os.utime(path)  # mark as recently used for eviction
+    sites = list(site_ids)
+    if not sites:  # pyarrow cannot bind an empty "in" set
+        return pd.read_parquet(path).iloc[:0]
+    return pd.read_parquet(path, filters=[("site", "in", sites)])
+
+
+def invalidate(week=None, cache_dir: Path = CACHE_DIR) -> list:
+    """Remove the snapshots of one week (every week if ``week`` is None); returns the removed names."""
+    pattern = f"*_{week}-*.parquet" if week else "*.parquet"
+    removed = []
+    for path in cache_dir.glob(pattern):
+        path.unlink(missing_ok=True)
+        removed.append(path.name)
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the weekly table snapshot cache.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="show cached snapshots")
+    inv = sub.add_parser("invalidate", help="delete snapshots")
+    target = inv.add_mutually_exclusive_group(required=True)
+    target.add_argument("--week", help="week suffix, e.g. WK2525")
+    target.add_argument("--all", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for path in sorted(CACHE_DIR.glob("*.parquet")):
+            print(f"{path.stat().st_size / 2**20:10.1f} MB  {path.name}")
+    else:
+        for name in invalidate(None if args.all else args.week):
+            print(f"Deleted: {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Stream DataFrames as CSV entries straight into zip archives, without temporary files.
+
+``CsvSpool`` is the batch-by-batch variant for SITE_BATCH_SIZE: each batch's
+frames are pickled to one temporary file per entry as they are produced, and
+the archives are written from those files one batch at a time at the end.
+"""
+import io
+import logging
+import pickle
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+_BLOCK_SIZE = 4 << 20
+
+
+def _write_archive(zip_path, frames, compresslevel):
+    """Write one archive with an ``entry_name.csv`` per item of ``frames``: a DataFrame, or a ``_SpooledFrames``."""
+    start = time.perf_counter()
+    with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
+        for entry_name, df in frames.items():
+            # force_zip64: the entry size is not known up front, and a large history export may pass 2 GiB
+            with zipf.open(entry_name, 'w', force_zip64=True) as entry:
+                # Hand zlib large blocks: it releases the GIL per call, which is what lets archives overlap
+                with io.TextIOWrapper(io.BufferedWriter(entry, _BLOCK_SIZE), encoding='utf-8', newline='') as text:
+                    df.to_csv(text, index=False)
+    logging.info("Wrote %s (%d entries) in %.2fs", zip_path, len(frames), time.perf_counter() - start)
+    return zip_path
+
+
+def write_csv_archives(archives: dict, compresslevel: int = None, parallel: bool = False) -> list:
+    """Write ``{zip_path: {entry_name: DataFrame}}`` and return the archive paths.
+
+    Each DataFrame's CSV encoding is deflated into its zip entry as it is
+    produced, so nothing is written to disk outside the archives. With
+    ``parallel=True`` every archive is written on its own thread; zlib drops
+    the GIL while compressing, so one archive's compression overlaps another's
+    CSV encoding. ``compresslevel`` is the zlib level (0-9, default 6).
+    """
+    if not parallel or len(archives) < 2:
+        return [_write_archive(path, frames, compresslevel) for path, frames in archives.items()]
+    with ThreadPoolExecutor(max_workers=len(archives), thread_name_prefix="zip") as pool:
+        futures = [pool.submit(_write_archive, path, frames, compresslevel) for path, frames in archives.items()]
+        return [future.result() for future in futures]
+
+
+def _column_order(column_lists) -> list:
+    """One column order that keeps every list's relative order.
+
+    Columns no list orders against each other (the date columns of different
+    batches' pivots) come out sorted, as pivot sorts them; labels that do not
+    compare keep the order they were first seen in.
+    """
+    seen, after, before = {}, {}, {}
+    for columns in column_lists:
+        for label in columns:
+            if label not in seen:
+                seen[label] = len(seen)
+                after[label], before[label] = set(), 0
+        for a, b in zip(columns, columns[1:]):
+            if b not in after[a]:
+                after[a].add(b)
+                before[b] += 1
+    ready = [label for label in seen if before[label] == 0]
+    order = []
+    while ready:
+        try:
+            label = min(ready)
+        except TypeError:
+            label = min(ready, key=seen.get)
+        ready.remove(label)
+        order.append(label)
+        for b in sorted(after[label], key=seen.get):
+            before[b] -= 1
+            if before[b] == 0:
+                ready.append(b)
+    # Batches that order two columns differently leave a cycle; those follow in first-seen order
+    placed = set(order)
+    return order + [label for label in seen if label not in placed]
+
+
+def _common_dtype(dtypes, missing: bool):
+    """The dtype concatenating columns of ``dtypes`` gives; ``missing``: some batch lacks the column (NaN)."""
+    if missing:
+        dtypes = dtypes + [np.dtype('float64')]
+    if all(dtype == dtypes[0] for dtype in dtypes):
+        return dtypes[0]
+    if all(isinstance(dtype, np.dtype) and dtype.kind in 'iuf' for dtype in dtypes):
+        return np.result_type(*dtypes)
+    return np.dtype(object)
+
+
+class _SpooledFrames:
+    """The batches of one CSV entry, pickled to a temporary file; written out as one CSV by ``to_csv``."""
+
+    def __init__(self, directory=None):
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._batches = []  # (columns, dtypes, rows) per pickled batch
+
+    def append(self, df):
+        pickle.dump(df, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._batches.append((list(df.columns), dict(df.dtypes.items()), len(df)))
+
+    def _layout(self):
+        """Columns and dtypes of the CSV: the columns of every batch with rows, as their concatenation would have them.
+
+        Empty batches are left out: a stage given no rows can return its columns in another order, or others.
+        """
+        filled = [batch for batch in self._batches if batch[2]] or self._batches
+        columns = _column_order([batch_columns for batch_columns, _, _ in filled])
+        dtypes = {label: _common_dtype([batch_dtypes[label] for _, batch_dtypes, _ in filled if label in batch_dtypes],
+                                       any(label not in batch_dtypes for _, batch_dtypes, _ in filled))
+                  for label in columns}
+        return columns, dtypes
+
+    def to_csv(self, text, index=False):
+        columns, dtypes = self._layout()
+        self._file.seek(0)
+        for number in range(len(self._batches)):
+            df = pickle.load(self._file)
+            if list(df.columns) != columns:
+                df = df.reindex(columns=columns)  # an empty batch may lack columns or carry others
+            changed = {label: dtype for label, dtype in dtypes.items() if df[label].dtype != dtype}
+            if changed:
+                df = df.astype(changed)
+            df.to_csv(text, index=index, header=number == 0)
+
+    def close(self):
+        self._file.close()
+
+
+class CsvSpool:
+    """Collects ``{zip_path: {entry_name: DataFrame}}`` batch by batch and writes the archives at the end.
+
+    Only the batch being appended or written is held in memory. Each entry's
+    CSV is the concatenation of its batches, in the order they were appended,
+    under one header that covers the columns of every batch.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._archives = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def paths(self) -> list:
+        return list(self._archives)
+
+    def append(self, archives: dict):
+        for zip_path, frames in archives.items():
+            entries = self._archives.setdefault(zip_path, {})
+            for entry_name, df in frames.items():
+                if entry_name not in entries:
+                    entries[entry_name] = _SpooledFrames(self.directory)
+                entries[entry_name].append(df)
+
+    def write(self, compresslevel: int = None, parallel: bool = False) -> list:
+        """Write every archive as ``write_csv_archives`` does; returns the archive paths."""
+        return write_csv_archives(self._archives, compresslevel=compresslevel, parallel=parallel)
+
+    def close(self):
+        for entries in self._archives.values():
+            for spooled in entries.values():
+                spooled.close()
+        self._archives = {}